@@ -0,0 +1,154 @@
+# coding: utf-8
+"""Compare per-request connections with the pooled RequestsClient session.
+
+Starts a local HTTPS stub (self-signed certificate generated with the
+`openssl` command), issues the same number of API calls through fresh
+`APIRequestor` instances with keep-alive disabled and enabled, and reports
+the wall time and the number of TCP connections the stub accepted.
+
+    python -m benchmarks.connection_pool --requests 200 --threads 4
+"""
+
+import argparse
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import payjp
+from payjp import api_requestor, http_client
+
+BODY = b'{"object": "charge", "id": "ch_bench", "amount": 100}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super(StubServer, self).__init__(*args, **kwargs)
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def get_request(self):
+        conn, addr = super(StubServer, self).get_request()
+        with self._lock:
+            self.connections += 1
+        return conn, addr
+
+
+def make_certificate(directory):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.check_call(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-keyout",
+            key,
+            "-out",
+            cert,
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return cert, key
+
+
+def start_server(tls_dir):
+    server = StubServer(("127.0.0.1", 0), StubHandler)
+    scheme = "http"
+    if tls_dir is not None:
+        cert, key = make_certificate(tls_dir)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, "%s://127.0.0.1:%d" % (scheme, server.server_address[1])
+
+
+def run(client, api_base, requests, threads):
+    def call(_):
+        # A new requestor per call, as the resource classes do.
+        requestor = api_requestor.APIRequestor(
+            key="sk_test_bench", client=client, api_base=api_base
+        )
+        requestor.request("get", "/v1/charges/ch_bench")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, range(requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--plain-http", action="store_true")
+    args = parser.parse_args()
+
+    payjp.api_key = "sk_test_bench"
+    tls_dir = None
+    if not args.plain_http and shutil.which("openssl"):
+        tls_dir = tempfile.mkdtemp()
+
+    try:
+        server, api_base = start_server(tls_dir)
+        print(
+            "stub: %s, %d requests, %d threads"
+            % (api_base, args.requests, args.threads)
+        )
+        for label, keep_alive in (("no keep-alive", False), ("pooled", True)):
+            client = http_client.RequestsClient(
+                pool_maxsize=args.threads,
+                keep_alive=keep_alive,
+                verify_ssl_certs=False,
+            )
+            server.connections = 0
+            elapsed = run(client, api_base, args.requests, args.threads)
+            client.close()
+            print(
+                "%-14s %8.3fs  %8.2f ms/call  %5d connections"
+                % (
+                    label,
+                    elapsed,
+                    elapsed * 1000 / args.requests,
+                    server.connections,
+                )
+            )
+        server.shutdown()
+    finally:
+        if tls_dir is not None:
+            shutil.rmtree(tls_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
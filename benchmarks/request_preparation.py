@@ -0,0 +1,67 @@
+# coding: utf-8
+"""Measure the per-call CPU cost of APIRequestor request preparation.
+
+"cold" clears the user-agent and header caches before every call, which is
+what each request paid before they were cached; "warm" is the steady state.
+
+    python -m benchmarks.request_preparation --calls 20000
+    python -m benchmarks.request_preparation --fail-above 20
+
+With --fail-above the script exits non-zero when the warm cost per call
+exceeds the given number of microseconds, so it can guard against
+regressions in CI.
+"""
+
+import argparse
+import sys
+import time
+
+from payjp import api_requestor, http_client
+
+PARAMS = {
+    "amount": 1000,
+    "currency": "jpy",
+    "card": "tok_76e202b409f3da51a0706605ac81",
+    "metadata": {"order_id": "1234"},
+}
+
+
+def clear_caches():
+    api_requestor._client_user_agent.cache_clear()
+    api_requestor._base_headers.cache_clear()
+
+
+def measure(requestor, calls, cold):
+    start = time.perf_counter()
+    for _ in range(calls):
+        if cold:
+            clear_caches()
+        requestor._prepare_request("post", "/v1/charges", PARAMS)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--fail-above", type=float, default=None)
+    args = parser.parse_args()
+
+    requestor = api_requestor.APIRequestor(
+        key="sk_test_bench",
+        client=http_client.RequestsClient(),
+        account="acct_bench",
+    )
+
+    cold = measure(requestor, args.calls, cold=True)
+    warm = measure(requestor, args.calls, cold=False)
+
+    print("cold  %8.2f us/call" % cold)
+    print("warm  %8.2f us/call  (%.1fx)" % (warm, cold / warm))
+
+    if args.fail_above is not None and warm > args.fail_above:
+        print("warm cost exceeds %.2f us/call" % args.fail_above)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,35 @@ api_version = None
 max_retry = 0
 retry_initial_delay = 2
 retry_max_delay = 32
+# A `payjp.retry.RetryPolicy` deciding which failures are retried; the
+# process-wide `payjp.retry.default_policy` when None.
+retry_policy = None
+
+# Seconds each API call may take, retries included; None for no limit.
+# See also `payjp.deadline`.
+timeout = None
+
+# HTTP client shared by every APIRequestor that isn't given one explicitly.
+# Created lazily with `http_client.new_default_http_client()` on first use.
+default_http_client = None
+# Same for AsyncAPIRequestor, created with
+# `http_client.new_default_async_http_client()`.
+default_async_http_client = None
+
+# A `payjp.hooks.Instrumentation` receiving request events, if any.
+instrumentation = None
+
+# A `payjp.concurrency.ConcurrencyLimiter` capping requests in flight across
+# all threads, if any.
+concurrency_limiter = None
+
+# A `payjp.ratelimit.RateLimiter` throttling requests before they are sent,
+# if any.
+rate_limiter = None
+
+# A `payjp.circuit.CircuitBreaker` failing calls fast while an endpoint is
+# unhealthy, if any.
+circuit_breaker = None
 
 # TODO include Card?
 __all__ = [
@@ -25,6 +54,8 @@ __all__ = [
     "Term",
     "Balance",
     "ThreeDSecureRequest",
+    "Client",
+    "deadline",
 ]
 
 # Resource
@@ -42,3 +73,6 @@ from payjp.resource import (  # noqa
     Balance,
     ThreeDSecureRequest,
 )
+
+from payjp.client import Client  # noqa
+from payjp.timeouts import deadline  # noqa
@@ -1,12 +1,16 @@
 # coding: utf-8
 
+import asyncio
 import base64
 import calendar
 import datetime
+import functools
+import itertools
 import json
 import logging
 import platform
 import random
+import threading
 import time
 from urllib.parse import urlencode, urlsplit, urlunsplit
 
@@ -15,48 +19,173 @@ import payjp
 from . import (
     error,
     http_client,
+    retry,
+    timeouts,
     version,
 )
+from .response import PayjpResponse, ResponseMetadata
 
 logger = logging.getLogger("payjp")
 
+_default_client_lock = threading.Lock()
+
+
+def _get_default_http_client():
+    if payjp.default_http_client is None:
+        with _default_client_lock:
+            if payjp.default_http_client is None:
+                payjp.default_http_client = http_client.new_default_http_client()
+    return payjp.default_http_client
+
+
+def _get_default_async_http_client():
+    if payjp.default_async_http_client is None:
+        with _default_client_lock:
+            if payjp.default_async_http_client is None:
+                payjp.default_async_http_client = (
+                    http_client.new_default_async_http_client()
+                )
+    return payjp.default_async_http_client
+
 
 class APIRequestor(object):
-    def __init__(self, key=None, client=None, api_base=None, account=None):
+    def __init__(
+        self, key=None, client=None, api_base=None, account=None, payjp_client=None
+    ):
+        # Settings not given explicitly are read from the `payjp.Client` the
+        # requestor was created for, or from the module globals otherwise.
+        self._config = payjp_client if payjp_client is not None else payjp
+
         if api_base:
             self.api_base = api_base
         else:
-            self.api_base = payjp.api_base
+            self.api_base = self._config.api_base
         self.api_key = key
         self.payjp_account = account
 
-        self._client = client or http_client.new_default_http_client()
+        self._client = client or _get_default_http_client()
 
-    def _get_retry_delay(self, retry_count):
+    def _get_retry_delay(self, retry_count, metadata=None):
         """Get retry delay seconds.
 
-        Based on "Exponential backoff with equal jitter" algorithm.
+        A delay requested by the server with `Retry-After` or rate-limit
+        headers is honored, up to `retry_max_delay`.  Otherwise it is based
+        on "Exponential backoff with equal jitter" algorithm.
         https://aws.amazon.com/jp/blogs/architecture/exponential-backoff-and-jitter/
         """
-        wait = min(payjp.retry_max_delay, payjp.retry_initial_delay * 2**retry_count)
+        hint = metadata.retry_after if metadata is not None else None
+        if hint is not None:
+            return min(self._config.retry_max_delay, hint)
+        wait = min(
+            self._config.retry_max_delay,
+            self._config.retry_initial_delay * 2**retry_count,
+        )
         return wait / 2 + random.uniform(0, wait / 2)
 
     def request(self, method, url, params=None, headers=None):
-        max_retry = payjp.max_retry or 0
-        for i in range(max_retry + 1):
-            body, code, my_api_key = self.request_raw(
-                method.lower(), url, params, headers
-            )
-            if code != 429:
-                break
-            elif i != max_retry:
-                wait = self._get_retry_delay(i)
-                logger.debug("Retry after %s seconds." % wait)
-                time.sleep(wait)
-
-        response = self.interpret_response(body, code)
+        policy = self._config.retry_policy or retry.default_policy
+        policy.record_attempt()
+        deadline = self._deadline()
+        for i in itertools.count():
+            try:
+                body, code, metadata, my_api_key = self.request_raw(
+                    method.lower(), url, params, headers, deadline=deadline
+                )
+            except error.APIConnectionError as e:
+                wait = self._retry_delay(
+                    policy, deadline, i, method, url, headers, exc=e
+                )
+                if wait is None:
+                    raise
+            else:
+                wait = self._retry_delay(
+                    policy, deadline, i, method, url, headers, code, metadata
+                )
+                if wait is None:
+                    break
+            time.sleep(wait)
+
+        metadata.retries = i
+        response = self.interpret_response(body, code, metadata)
         return response, my_api_key
 
+    def _enter_circuit(self, breaker, url):
+        if breaker is None:
+            return None
+        token, transition = breaker.acquire(self.api_base, url)
+        self._circuit_changed(transition)
+        return token
+
+    def _exit_circuit(self, breaker, token, code, elapsed, failure):
+        transition = breaker.release(token, status=code, elapsed=elapsed, exc=failure)
+        self._circuit_changed(transition)
+
+    def _circuit_changed(self, transition):
+        if transition is None:
+            return
+        (api_base, family), previous, state = transition
+        logger.warning(
+            "Circuit for %s %s changed from %s to %s", api_base, family, previous, state
+        )
+        self._instrument(
+            "circuit", api_base=api_base, family=family, previous=previous, state=state
+        )
+
+    def _deadline(self):
+        """The deadline of a call: the `payjp.deadline` block's, or the
+        configured `timeout`, whichever comes first."""
+        deadline = timeouts.current()
+        timeout = self._config.timeout
+        if timeout is not None:
+            default = timeouts.Deadline(timeout)
+            if deadline is None or default.expires_at < deadline.expires_at:
+                deadline = default
+        return deadline
+
+    def _transport_options(self, deadline):
+        if deadline is None:
+            return {}
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise error.APITimeoutError(
+                "Deadline of %s seconds exceeded before the request was sent."
+                % (deadline.timeout,)
+            )
+        return {"timeout": remaining}
+
+    def _retry_delay(
+        self,
+        policy,
+        deadline,
+        attempt,
+        method,
+        url,
+        headers,
+        status=None,
+        metadata=None,
+        exc=None,
+    ):
+        """Seconds to wait before retrying, or None to give up."""
+        if attempt >= (self._config.max_retry or 0):
+            return None
+        if not policy.should_retry(method, headers, status=status, exc=exc):
+            return None
+        wait = self._get_retry_delay(attempt, metadata)
+        if deadline is not None and wait >= deadline.remaining():
+            logger.debug("Not retrying; backoff would overshoot the deadline.")
+            return None
+        logger.debug("Retry after %s seconds." % wait)
+        self._instrument(
+            "retry",
+            method=method,
+            url=url,
+            attempt=attempt,
+            wait=wait,
+            status=status,
+            error=exc,
+        )
+        return wait
+
     def handle_api_error(self, body, code, response):
         try:
             err = response["error"]
@@ -87,15 +216,55 @@ class APIRequestor(object):
         else:
             raise error.APIError(err.get("message"), body, code, response)
 
-    def request_raw(self, method, url, params=None, supplied_headers=None):
-        from payjp import api_version
+    def request_raw(
+        self, method, url, params=None, supplied_headers=None, deadline=None
+    ):
+        abs_url, headers, post_data, my_api_key = self._prepare_request(
+            method, url, params, supplied_headers
+        )
+
+        breaker = self._config.circuit_breaker
+        circuit = self._enter_circuit(breaker, url)
+        code = elapsed = failure = None
+        try:
+            rate_limiter = self._config.rate_limiter
+            if rate_limiter is not None:
+                wait = rate_limiter.acquire(my_api_key, self.payjp_account, method)
+                if wait:
+                    self._instrument("throttle", method=method, url=abs_url, wait=wait)
+
+            limiter = self._config.concurrency_limiter
+            token = limiter.acquire() if limiter is not None else None
+            start = time.perf_counter()
+            try:
+                kwargs = self._transport_options(deadline)
+                body, code, rheaders, timing = _unpack_response(
+                    self._client.request(method, abs_url, headers, post_data, **kwargs)
+                )
+            finally:
+                elapsed = time.perf_counter() - start
+                if limiter is not None:
+                    limiter.release(token, status=code, elapsed=elapsed)
+        except Exception as e:
+            failure = e
+            raise
+        finally:
+            if circuit is not None:
+                self._exit_circuit(breaker, circuit, code, elapsed, failure)
+
+        timing.setdefault("total", elapsed)
+        metadata = ResponseMetadata(method, abs_url, code, rheaders, timing)
+        self._log_response(metadata, body)
+
+        return body, code, metadata, my_api_key
+
+    def _prepare_request(self, method, url, params=None, supplied_headers=None):
+        api_version = self._config.api_version
 
         if self.api_key:
             my_api_key = self.api_key
         else:
-            from payjp import api_key
-
-            my_api_key = api_key
+            my_api_key = self._config.api_key
 
         if my_api_key is None:
             raise error.AuthenticationError(
@@ -119,77 +288,228 @@ class APIRequestor(object):
         else:
             raise error.APIConnectionError("Unrecognized HTTP method %r." % (method,))
 
-        ua = {
-            "bindings_version": version.VERSION,
-            "lang": "python",
-            "publisher": "payjp",
-            "httplib": self._client.name,
-        }
-
-        for attr, func in [
-            ["lang_version", platform.python_version],
-            ["platform", platform.platform],
-            ["uname", lambda: " ".join(platform.uname())],
-        ]:
-            try:
-                val = func()
-            except Exception as e:
-                val = "!! %s" % (e,)
-            ua[attr] = val
-
-        encoded_api_key = str(
-            base64.b64encode(bytes("".join([my_api_key, ":"]), "utf-8")), "utf-8"
+        headers = dict(
+            _base_headers(
+                my_api_key,
+                self._client.name,
+                self.payjp_account,
+                api_version,
+                method == "post",
+            )
         )
 
-        headers = {
-            "X-Payjp-Client-User-Agent": json.dumps(ua),
-            "User-Agent": "Payjp/v1 PythonBindings/%s" % (version.VERSION,),
-            "Authorization": "Basic %s" % encoded_api_key,
-        }
-
-        if self.payjp_account:
-            headers["Payjp-Account"] = self.payjp_account
-
-        if method == "post":
-            headers["Content-Type"] = "application/x-www-form-urlencoded"
-
-        if api_version is not None:
-            headers["Payjp-Version"] = api_version
-
         if supplied_headers is not None:
             for key, value in supplied_headers.items():
                 headers[key] = value
 
-        body, code = self._client.request(method, abs_url, headers, post_data)
+        return abs_url, headers, post_data, my_api_key
 
-        logger.info("%s %s %d", method.upper(), abs_url, code)
+    def _log_response(self, metadata, body):
+        logger.info(
+            "%s %s %d (request id %s)",
+            metadata.method.upper(),
+            metadata.url,
+            metadata.status,
+            metadata.request_id,
+        )
         logger.debug(
             "API request to %s returned (response code, response body) of (%d, %r)",
-            abs_url,
-            code,
+            metadata.url,
+            metadata.status,
             body,
         )
+        self._instrument(
+            "request",
+            method=metadata.method,
+            url=metadata.url,
+            account=self.payjp_account,
+            status=metadata.status,
+            elapsed=metadata.timing["total"],
+            request_id=metadata.request_id,
+            timing=metadata.timing,
+        )
 
-        return body, code, my_api_key
+    def _instrument(self, event, **payload):
+        instrumentation = self._config.instrumentation
+        if instrumentation is not None:
+            instrumentation.emit(event, payload)
 
-    def interpret_response(self, body, code):
+    def interpret_response(self, body, code, metadata=None):
         try:
-            if hasattr(body, "decode"):
-                body = body.decode("utf-8")
-            response = json.loads(body)
-        except Exception:
-            raise error.APIError(
-                "Invalid response body from API: %s "
-                "(HTTP response code was %d)" % (body, code),
-                body,
-                code,
-            )
-        if not (200 <= code < 300):
-            self.handle_api_error(body, code, response)
-
+            try:
+                if hasattr(body, "decode"):
+                    body = body.decode("utf-8")
+                response = json.loads(body)
+            except Exception:
+                raise error.APIError(
+                    "Invalid response body from API: %s "
+                    "(HTTP response code was %d)" % (body, code),
+                    body,
+                    code,
+                )
+            if not (200 <= code < 300):
+                self.handle_api_error(body, code, response)
+        except error.PayjpException as e:
+            e.last_response = metadata
+            raise
+
+        if metadata is not None and isinstance(response, dict):
+            response = PayjpResponse(response, metadata)
         return response
 
 
+class AsyncAPIRequestor(APIRequestor):
+    """asyncio counterpart of `APIRequestor`.
+
+    Requests go through an `http_client.AsyncHTTPClient` and the 429 retry
+    backoff awaits `asyncio.sleep`, so the event loop is never blocked.
+    """
+
+    def __init__(
+        self, key=None, client=None, api_base=None, account=None, payjp_client=None
+    ):
+        super(AsyncAPIRequestor, self).__init__(
+            key,
+            client=client or _get_default_async_http_client(),
+            api_base=api_base,
+            account=account,
+            payjp_client=payjp_client,
+        )
+
+    async def request(self, method, url, params=None, headers=None):
+        policy = self._config.retry_policy or retry.default_policy
+        policy.record_attempt()
+        deadline = self._deadline()
+        for i in itertools.count():
+            try:
+                body, code, metadata, my_api_key = await self.request_raw(
+                    method.lower(), url, params, headers, deadline=deadline
+                )
+            except error.APIConnectionError as e:
+                wait = self._retry_delay(
+                    policy, deadline, i, method, url, headers, exc=e
+                )
+                if wait is None:
+                    raise
+            else:
+                wait = self._retry_delay(
+                    policy, deadline, i, method, url, headers, code, metadata
+                )
+                if wait is None:
+                    break
+            await asyncio.sleep(wait)
+
+        metadata.retries = i
+        response = self.interpret_response(body, code, metadata)
+        return response, my_api_key
+
+    async def request_raw(
+        self, method, url, params=None, supplied_headers=None, deadline=None
+    ):
+        abs_url, headers, post_data, my_api_key = self._prepare_request(
+            method, url, params, supplied_headers
+        )
+
+        breaker = self._config.circuit_breaker
+        circuit = self._enter_circuit(breaker, url)
+        code = elapsed = failure = None
+        try:
+            rate_limiter = self._config.rate_limiter
+            if rate_limiter is not None:
+                wait = await rate_limiter.aacquire(
+                    my_api_key, self.payjp_account, method
+                )
+                if wait:
+                    self._instrument("throttle", method=method, url=abs_url, wait=wait)
+
+            limiter = self._config.concurrency_limiter
+            token = await limiter.aacquire() if limiter is not None else None
+            start = time.perf_counter()
+            try:
+                kwargs = self._transport_options(deadline)
+                body, code, rheaders, timing = _unpack_response(
+                    await self._client.request(
+                        method, abs_url, headers, post_data, **kwargs
+                    )
+                )
+            finally:
+                elapsed = time.perf_counter() - start
+                if limiter is not None:
+                    limiter.release(token, status=code, elapsed=elapsed)
+        except Exception as e:
+            failure = e
+            raise
+        finally:
+            if circuit is not None:
+                self._exit_circuit(breaker, circuit, code, elapsed, failure)
+
+        timing.setdefault("total", elapsed)
+        metadata = ResponseMetadata(method, abs_url, code, rheaders, timing)
+        self._log_response(metadata, body)
+
+        return body, code, metadata, my_api_key
+
+
+def _unpack_response(result):
+    """Normalize what an HTTP client returned to a 4-tuple."""
+    if len(result) == 2:
+        return result[0], result[1], {}, {}
+    body, code, headers, timing = result
+    return body, code, headers or {}, dict(timing or {})
+
+
+@functools.lru_cache(maxsize=None)
+def _client_user_agent(httplib):
+    """JSON for the X-Payjp-Client-User-Agent header, computed once per process."""
+    ua = {
+        "bindings_version": version.VERSION,
+        "lang": "python",
+        "publisher": "payjp",
+        "httplib": httplib,
+    }
+
+    for attr, func in [
+        ["lang_version", platform.python_version],
+        ["platform", platform.platform],
+        ["uname", lambda: " ".join(platform.uname())],
+    ]:
+        try:
+            val = func()
+        except Exception as e:
+            val = "!! %s" % (e,)
+        ua[attr] = val
+
+    return json.dumps(ua)
+
+
+@functools.lru_cache(maxsize=1024)
+def _base_headers(api_key, httplib, account, api_version, is_post):
+    """Headers shared by every request with the same key and settings.
+
+    The returned dict is cached; copy it before adding per-request headers.
+    """
+    encoded_api_key = str(
+        base64.b64encode(bytes("".join([api_key, ":"]), "utf-8")), "utf-8"
+    )
+
+    headers = {
+        "X-Payjp-Client-User-Agent": _client_user_agent(httplib),
+        "User-Agent": "Payjp/v1 PythonBindings/%s" % (version.VERSION,),
+        "Authorization": "Basic %s" % encoded_api_key,
+    }
+
+    if account:
+        headers["Payjp-Account"] = account
+
+    if is_post:
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+    if api_version is not None:
+        headers["Payjp-Version"] = api_version
+
+    return headers
+
+
 def _encode_datetime(dttime):
     if dttime.tzinfo and dttime.tzinfo.utcoffset(dttime) is not None:
         utc_timestamp = calendar.timegm(dttime.utctimetuple())
@@ -0,0 +1,176 @@
+# coding: utf-8
+
+import asyncio
+import collections
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from payjp import error
+
+
+class BatchResult(object):
+    """Outcome of one operation of a batch.
+
+    `result` holds the return value of the operation, or `error` the
+    `error.PayjpException` it raised.
+    """
+
+    __slots__ = ("index", "operation", "result", "error")
+
+    def __init__(self, index, operation, result=None, error=None):
+        self.index = index
+        self.operation = operation
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "<BatchResult %d ok: %r>" % (self.index, self.result)
+        return "<BatchResult %d failed: %r>" % (self.index, self.error)
+
+
+class BatchProgress(object):
+    """Counters of a running batch, passed to the `progress` callback."""
+
+    def __init__(self):
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def completed(self):
+        return self.succeeded + self.failed
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def __repr__(self):
+        return "<BatchProgress completed=%d succeeded=%d failed=%d>" % (
+            self.completed,
+            self.succeeded,
+            self.failed,
+        )
+
+
+class BatchExecutor(object):
+    """Runs many API operations with bounded concurrency.
+
+    Operations are callables taking no arguments, typically built with
+    `functools.partial`:
+
+        operations = (
+            functools.partial(payjp.Charge.create, amount=a, currency="jpy",
+                              customer=c)
+            for c, a in rows
+        )
+        for result in BatchExecutor(workers=8).run(operations):
+            if not result.ok:
+                print(result.index, result.error)
+
+    `run` yields a `BatchResult` per operation in input order.  At most
+    `window` operations (twice `workers` by default) are taken from the
+    input ahead of the consumer, so neither the input nor the results are
+    held in memory as a whole.  `error.PayjpException`s raised by an
+    operation are reported in its result; any other exception stops the
+    batch.
+
+    Requests are made by `workers` threads of the executor (or of
+    `executor`, if given) and share the pooled HTTP client, so
+    `payjp.concurrency_limiter` also applies.  `progress` is called with a
+    `BatchProgress` after each result is yielded.
+    """
+
+    def __init__(self, workers=8, window=None, executor=None, progress=None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.window = window or workers * 2
+        self.executor = executor
+        self.progress = progress
+
+    def run(self, operations):
+        operations = enumerate(operations)
+        stats = BatchProgress()
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.workers)
+        pending = collections.deque()
+
+        def submit(count):
+            for index, operation in itertools.islice(operations, count):
+                pending.append((index, operation, executor.submit(operation)))
+                stats.submitted += 1
+
+        try:
+            submit(self.window)
+            while pending:
+                index, operation, future = pending.popleft()
+                try:
+                    result = BatchResult(index, operation, result=future.result())
+                except error.PayjpException as e:
+                    result = BatchResult(index, operation, error=e)
+                future = None
+                submit(1)
+                yield self._record(stats, result)
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            if self.executor is None:
+                executor.shutdown(wait=False)
+
+    async def arun(self, operations):
+        """Like `run`, for operations returning awaitables.
+
+        Up to `workers` operations run as concurrent tasks:
+
+            operations = (
+                functools.partial(payjp.Charge.acreate, amount=a,
+                                  currency="jpy", customer=c)
+                for c, a in rows
+            )
+            async for result in BatchExecutor(workers=16).arun(operations):
+                ...
+        """
+        operations = enumerate(operations)
+        stats = BatchProgress()
+        pending = collections.deque()
+
+        def submit(count):
+            for index, operation in itertools.islice(operations, count):
+                task = asyncio.ensure_future(operation())
+                pending.append((index, operation, task))
+                stats.submitted += 1
+
+        try:
+            submit(self.workers)
+            while pending:
+                index, operation, task = pending.popleft()
+                try:
+                    result = BatchResult(index, operation, result=await task)
+                except error.PayjpException as e:
+                    result = BatchResult(index, operation, error=e)
+                task = None
+                submit(1)
+                yield self._record(stats, result)
+        finally:
+            for _, _, task in pending:
+                task.cancel()
+
+    def _record(self, stats, result):
+        if result.ok:
+            stats.succeeded += 1
+        else:
+            stats.failed += 1
+        if self.progress is not None:
+            self.progress(stats)
+        return result
+
+
+def run(operations, workers=8, **kwargs):
+    """Shortcut for `BatchExecutor(workers, **kwargs).run(operations)`."""
+    return BatchExecutor(workers, **kwargs).run(operations)
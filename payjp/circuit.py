@@ -0,0 +1,188 @@
+# coding: utf-8
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+from payjp import error
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(object):
+    """Fails calls fast while an endpoint family is unhealthy.
+
+    Install one as `payjp.circuit_breaker` (or pass it to `payjp.Client`).
+    Requests are grouped into circuits by `api_base` and endpoint family,
+    the first path segment after the version (`charges`, `tokens`,
+    `events`...).  Each circuit counts its calls over the last `window`
+    seconds; a call fails if it gets a 5xx response or a transient
+    connection error, and is slow if it takes longer than `slow_call`
+    seconds.
+
+    Once at least `min_calls` were made in the window and the share of
+    failed calls reaches `failure_rate` (or that of slow calls reaches
+    `slow_call_rate`), the circuit opens: calls raise
+    `error.CircuitOpenError` without being sent.  After `open_duration`
+    seconds it is half-open and lets `half_open_calls` probe calls
+    through; it closes if they all succeed and opens again otherwise.
+
+    State changes are emitted as "circuit" instrumentation events.
+    """
+
+    def __init__(
+        self,
+        failure_rate=0.5,
+        slow_call=None,
+        slow_call_rate=0.8,
+        min_calls=20,
+        window=30.0,
+        open_duration=30.0,
+        half_open_calls=1,
+        clock=time.monotonic,
+    ):
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+        self._clock = clock
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def state(self, api_base, family):
+        with self._lock:
+            circuit = self._circuits.get((api_base, family))
+            return circuit.current_state(self._clock()) if circuit else CLOSED
+
+    def acquire(self, api_base, path):
+        """Admit a call to `path`; returns `(token, transition)`.
+
+        `transition` is a `(circuit key, old state, new state)` tuple if
+        admitting the call changed the circuit's state.  Raises
+        `error.CircuitOpenError` if the circuit is open.
+        """
+        key = (api_base, _family(path))
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None:
+                circuit = self._circuits[key] = _Circuit(self)
+            now = self._clock()
+            before = circuit.state
+            admitted = circuit.admit(now)
+            transition = _transition(key, before, circuit.state)
+        if not admitted:
+            raise error.CircuitOpenError(
+                "Circuit for %s %s is open; the request was not sent." % key
+            )
+        return (key, circuit, circuit.state == HALF_OPEN), transition
+
+    def release(self, token, status=None, elapsed=None, exc=None):
+        """Record the outcome of a call; returns a transition, if any."""
+        key, circuit, probe = token
+        if exc is not None and not getattr(exc, "should_retry", False):
+            # Not a sign of the endpoint's health.
+            failed = None
+        else:
+            failed = exc is not None or (status is not None and status >= 500)
+        slow = (
+            self.slow_call is not None
+            and elapsed is not None
+            and elapsed > self.slow_call
+        )
+        with self._lock:
+            before = circuit.state
+            circuit.record(self._clock(), probe, failed, slow)
+            return _transition(key, before, circuit.state)
+
+
+class _Circuit(object):
+    BUCKETS = 10
+
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.state = CLOSED
+        self.opened_at = None
+        self.probes = 0
+        self.probe_successes = 0
+        self.bucket_width = breaker.window / self.BUCKETS
+        # [bucket start, calls, failures, slow calls]
+        self.buckets = []
+
+    def current_state(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.breaker.open_duration:
+            return HALF_OPEN
+        return self.state
+
+    def admit(self, now):
+        if self.state == OPEN:
+            if now - self.opened_at < self.breaker.open_duration:
+                return False
+            self.state = HALF_OPEN
+            self.probes = 0
+            self.probe_successes = 0
+        if self.state == HALF_OPEN:
+            if self.probes >= self.breaker.half_open_calls:
+                return False
+            self.probes += 1
+        return True
+
+    def record(self, now, probe, failed, slow):
+        if self.state == HALF_OPEN and probe:
+            if failed or (failed is not None and slow):
+                self._open(now)
+            elif failed is None:
+                # Inconclusive; let another probe through.
+                self.probes -= 1
+            else:
+                self.probe_successes += 1
+                if self.probe_successes >= self.breaker.half_open_calls:
+                    self.state = CLOSED
+                    self.buckets = []
+            return
+        if self.state != CLOSED or failed is None:
+            return
+
+        start = now - now % self.bucket_width
+        if not self.buckets or self.buckets[-1][0] != start:
+            self.buckets.append([start, 0, 0, 0])
+        bucket = self.buckets[-1]
+        bucket[1] += 1
+        bucket[2] += failed
+        bucket[3] += slow
+        horizon = now - self.breaker.window
+        while self.buckets[0][0] + self.bucket_width <= horizon:
+            self.buckets.pop(0)
+
+        calls = sum(b[1] for b in self.buckets)
+        if calls < self.breaker.min_calls:
+            return
+        failures = sum(b[2] for b in self.buckets)
+        slow_calls = sum(b[3] for b in self.buckets)
+        if (
+            failures >= calls * self.breaker.failure_rate
+            or slow_calls >= calls * self.breaker.slow_call_rate
+        ):
+            self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.buckets = []
+
+
+def _family(path):
+    segments = [s for s in urlsplit(path).path.split("/") if s]
+    if segments and segments[0].startswith("v") and segments[0][1:].isdigit():
+        segments = segments[1:]
+    return segments[0] if segments else ""
+
+
+def _transition(key, before, after):
+    if before == after:
+        return None
+    return key, before, after
@@ -0,0 +1,136 @@
+# coding: utf-8
+
+import functools
+import inspect
+
+import payjp
+from payjp import api_requestor, hooks, resource
+from payjp.http_client import (
+    new_default_async_http_client,
+    new_default_http_client,
+)
+
+
+class Client(object):
+    """Self-contained API configuration.
+
+    A client holds everything a request needs -- credentials, endpoint,
+    retry settings, its own HTTP connection pool, instrumentation hooks and
+    optional limiters and circuit breaker -- so several clients can be used
+    side by side without touching the module-level configuration
+    (`payjp.api_key`, `payjp.max_retry`, ...)::
+
+        client = payjp.Client(api_key="sk_test_xxx", retry=3)
+        charge = client.charges.create(amount=1000, currency="jpy", card="tok_xxx")
+        customer = client.customers.retrieve("cus_xxx")
+
+    Objects returned through a client keep a reference to it, so follow-up
+    calls such as `charge.refund()` or `customer.save()` use the same client.
+    """
+
+    def __init__(
+        self,
+        api_key=None,
+        api_base=None,
+        account=None,
+        api_version=None,
+        retry=0,
+        retry_initial_delay=2,
+        retry_max_delay=32,
+        retry_policy=None,
+        timeout=None,
+        http_client=None,
+        async_http_client=None,
+        instrumentation=None,
+        concurrency_limiter=None,
+        rate_limiter=None,
+        circuit_breaker=None,
+    ):
+        self.api_key = api_key
+        self.api_base = api_base or payjp.api_base
+        self.account = account
+        self.api_version = api_version
+
+        self.max_retry = retry
+        self.retry_initial_delay = retry_initial_delay
+        self.retry_max_delay = retry_max_delay
+        self.retry_policy = retry_policy
+        self.timeout = timeout
+
+        self.http_client = http_client or new_default_http_client()
+        self._async_http_client = async_http_client
+        self.instrumentation = instrumentation or hooks.Instrumentation()
+        self.concurrency_limiter = concurrency_limiter
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+
+        self.accounts = ResourceService(self, resource.Account)
+        self.balances = ResourceService(self, resource.Balance)
+        self.charges = ResourceService(self, resource.Charge)
+        self.customers = ResourceService(self, resource.Customer)
+        self.events = ResourceService(self, resource.Event)
+        self.plans = ResourceService(self, resource.Plan)
+        self.statements = ResourceService(self, resource.Statement)
+        self.subscriptions = ResourceService(self, resource.Subscription)
+        self.terms = ResourceService(self, resource.Term)
+        self.three_d_secure_requests = ResourceService(
+            self, resource.ThreeDSecureRequest
+        )
+        self.tokens = ResourceService(self, resource.Token)
+        self.transfers = ResourceService(self, resource.Transfer)
+
+    @property
+    def async_http_client(self):
+        if self._async_http_client is None:
+            self._async_http_client = new_default_async_http_client()
+        return self._async_http_client
+
+    def requestor(self, key=None, api_base=None, account=None):
+        return api_requestor.APIRequestor(
+            key or self.api_key,
+            client=self.http_client,
+            api_base=api_base,
+            account=account or self.account,
+            payjp_client=self,
+        )
+
+    def async_requestor(self, key=None, api_base=None, account=None):
+        return api_requestor.AsyncAPIRequestor(
+            key or self.api_key,
+            client=self.async_http_client,
+            api_base=api_base,
+            account=account or self.account,
+            payjp_client=self,
+        )
+
+    def close(self):
+        if hasattr(self.http_client, "close"):
+            self.http_client.close()
+
+
+class ResourceService(object):
+    """Exposes a resource class's API methods bound to a `Client`.
+
+    `client.charges.create(...)` is `payjp.Charge.create(...,
+    payjp_client=client)`.
+    """
+
+    _UNBOUND = frozenset(["class_name", "class_url"])
+
+    def __init__(self, client, resource_class):
+        self._client = client
+        self._resource_class = resource_class
+
+    def __getattr__(self, name):
+        attr = getattr(self._resource_class, name)
+        if (
+            name.startswith("_")
+            or name in self._UNBOUND
+            or not inspect.ismethod(attr)
+            or attr.__self__ is not self._resource_class
+        ):
+            return attr
+        return functools.partial(attr, payjp_client=self._client)
+
+    def __repr__(self):
+        return "<%s %s>" % (type(self).__name__, self._resource_class.__name__)
@@ -0,0 +1,184 @@
+# coding: utf-8
+
+import asyncio
+import collections
+import threading
+
+
+class ConcurrencyLimiter(object):
+    """Caps the number of API requests in flight at the same time.
+
+    Install one as `payjp.concurrency_limiter` (or pass it to `payjp.Client`)
+    and every request made by the requestors -- from any thread, and from
+    asyncio code -- waits for a free slot before it is sent.  This bounds
+    the load that parallel listing, bulk jobs and fan-out put on the API no
+    matter how many workers they use.
+
+    `acquire` returns a token which must be handed back to `release` along
+    with the outcome of the request (`status` is None if no response was
+    received, `elapsed` is in seconds).  Subclasses use the tags and the
+    feedback to implement smarter admission policies.
+    """
+
+    def __init__(self, max_concurrency):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self._max_concurrency = max_concurrency
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        # Futures of coroutines waiting in `aacquire`, with their loops.
+        self._async_waiters = collections.deque()
+
+    @property
+    def max_concurrency(self):
+        return self._max_concurrency
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def acquire(self, **tags):
+        with self._condition:
+            while not self._has_capacity():
+                self._condition.wait()
+            self._in_flight += 1
+            return self._on_acquire(tags)
+
+    async def aacquire(self, **tags):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._has_capacity():
+                    self._in_flight += 1
+                    return self._on_acquire(tags)
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._async_waiters.remove((loop, waiter))
+                    except ValueError:
+                        pass
+                raise
+
+    def release(self, token, status=None, elapsed=None):
+        with self._condition:
+            self._in_flight -= 1
+            self._on_release(token, status, elapsed)
+            self._notify()
+
+    def _has_capacity(self):
+        return self._in_flight < self._max_concurrency
+
+    def _on_acquire(self, tags):
+        return tags
+
+    def _on_release(self, token, status, elapsed):
+        pass
+
+    def _notify(self):
+        # Called with the lock held whenever capacity may have changed.
+        self._condition.notify_all()
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # The waiter's event loop has been closed.
+                pass
+
+
+class AdaptiveLimiter(ConcurrencyLimiter):
+    """Concurrency limiter that finds the limit the API can sustain (AIMD).
+
+    The limit starts at `initial` and grows additively, by `increase` per
+    round of `limit` healthy responses, up to `max_concurrency`.  A 429
+    response or a latency spike -- a response slower than
+    `latency_tolerance` times the smoothed latency -- cuts it
+    multiplicatively by `decrease`, down to `min_concurrency`.  Requests
+    already in flight when the limit is cut don't cut it again, so one
+    burst of 429s counts as one congestion signal.  5xx responses and
+    requests that got no response leave the limit unchanged.
+
+    Install one as `payjp.concurrency_limiter` and size worker pools
+    (`payjp.batch`, exporters, asyncio gathers) for `max_concurrency`: the
+    limiter decides how many of them actually send at once.
+    """
+
+    def __init__(
+        self,
+        initial=4,
+        min_concurrency=1,
+        max_concurrency=64,
+        increase=1.0,
+        decrease=0.5,
+        latency_tolerance=2.0,
+        smoothing=0.1,
+    ):
+        if not 1 <= min_concurrency <= initial <= max_concurrency:
+            raise ValueError(
+                "expected 1 <= min_concurrency <= initial <= max_concurrency"
+            )
+        if not 0 < decrease < 1:
+            raise ValueError("decrease must be between 0 and 1")
+        super(AdaptiveLimiter, self).__init__(max_concurrency)
+        self.min_concurrency = min_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self._limit = float(initial)
+        self._latency = None
+        self._epoch = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def latency(self):
+        """Smoothed latency of recent responses, in seconds."""
+        return self._latency
+
+    def _has_capacity(self):
+        return self._in_flight < int(self._limit)
+
+    def _on_acquire(self, tags):
+        return self._epoch, tags
+
+    def _on_release(self, token, status, elapsed):
+        epoch = token[0] if isinstance(token, tuple) else self._epoch
+        if status is None or status >= 500:
+            return
+
+        spike = False
+        if elapsed is not None:
+            if self._latency is None:
+                self._latency = elapsed
+            else:
+                spike = elapsed > self._latency * self.latency_tolerance
+                self._latency += (elapsed - self._latency) * self.smoothing
+
+        if status == 429 or spike:
+            if epoch == self._epoch:
+                self._epoch += 1
+                self._limit = max(
+                    float(self.min_concurrency), self._limit * self.decrease
+                )
+                self.decreases += 1
+        elif self._limit < self._max_concurrency:
+            self._limit = min(
+                float(self._max_concurrency),
+                self._limit + self.increase / self._limit,
+            )
+            self.increases += 1
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
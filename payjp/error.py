@@ -18,12 +18,49 @@ class PayjpException(Exception):
         self.http_status = http_status
         self.json_body = json_body
 
+    # The `response.ResponseMetadata` of the response that caused the error,
+    # set by the requestor.
+    last_response = None
+
+    @property
+    def headers(self):
+        return self.last_response.headers if self.last_response else None
+
+    @property
+    def request_id(self):
+        return self.last_response.request_id if self.last_response else None
+
 
 class APIError(PayjpException):
     pass
 
 
 class APIConnectionError(PayjpException):
+    def __init__(
+        self,
+        message=None,
+        http_body=None,
+        http_status=None,
+        json_body=None,
+        should_retry=False,
+    ):
+        super(APIConnectionError, self).__init__(
+            message, http_body, http_status, json_body
+        )
+        # Whether the failure is transient (a timeout or a dropped
+        # connection) rather than a local configuration problem.
+        self.should_retry = should_retry
+
+
+class APITimeoutError(APIConnectionError):
+    pass
+
+
+class CircuitOpenError(APIConnectionError):
+    pass
+
+
+class RateLimitError(APIError):
     pass
 
 
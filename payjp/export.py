@@ -0,0 +1,187 @@
+# coding: utf-8
+
+import collections
+import datetime
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from payjp import api_requestor
+
+logger = logging.getLogger("payjp")
+
+
+class TimeWindowExporter(object):
+    """Exports every object of a list endpoint created in `[since, until)`.
+
+    Instead of paging through one deep offset range, the range is cut into
+    time windows.  Each window is sized with a `limit=1` request reading the
+    list's `count`; windows holding more than `max_window_size` objects are
+    split in half recursively.  Windows are then fetched in parallel by
+    `executor` (a thread pool of `workers` threads unless given; a
+    `ProcessPoolExecutor` works too when the API key is passed explicitly)
+    while objects are yielded newest first, as the API lists them, with
+    duplicates caused by concurrent inserts removed.
+
+    With `checkpoint`, the lower bound of the exported range is written to
+    that file after each window has been consumed.  Running the same export
+    again resumes after the last completed window; objects of a window that
+    was being consumed during a crash are yielded again.
+
+        exporter = TimeWindowExporter(
+            payjp.Charge, since=1672498800, until=1704034800,
+            checkpoint="charges.checkpoint",
+        )
+        for charge in exporter:
+            ...
+    """
+
+    def __init__(
+        self,
+        resource_class,
+        since,
+        until=None,
+        max_window_size=2000,
+        workers=4,
+        executor=None,
+        checkpoint=None,
+        page_size=100,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
+    ):
+        self.resource_class = resource_class
+        self.since = _timestamp(since)
+        self.until = _timestamp(until) if until is not None else int(time.time()) + 1
+        if self.until <= self.since:
+            raise ValueError("until must be later than since")
+        self.max_window_size = max_window_size
+        self.workers = workers
+        self.executor = executor
+        self.checkpoint = checkpoint
+        self.page_size = page_size
+        self.params = params
+        self._options = dict(
+            api_key=api_key,
+            payjp_account=payjp_account,
+            api_base=api_base,
+            payjp_client=payjp_client,
+        )
+
+    def windows(self, until=None):
+        """Yield `(since, until, count)` windows, newest first."""
+        stack = [(self.since, self.until if until is None else until)]
+        while stack:
+            since, until = stack.pop()
+            if since >= until:
+                continue
+            count = self._probe(since, until)
+            if count > self.max_window_size and until - since > 1:
+                middle = since + (until - since) // 2
+                stack.append((since, middle))
+                stack.append((middle, until))
+            elif count:
+                yield since, until, count
+
+    def __iter__(self):
+        until = self._load_checkpoint()
+        windows = self.windows(until)
+        executor = self.executor or ThreadPoolExecutor(max_workers=self.workers)
+        pending = collections.deque()
+
+        def submit_next():
+            for since, until, count in windows:
+                future = executor.submit(
+                    _fetch_window,
+                    self.resource_class,
+                    since,
+                    until,
+                    self.page_size,
+                    self.params,
+                    self._options,
+                )
+                pending.append((since, future))
+                return True
+            return False
+
+        try:
+            for _ in range(self.workers):
+                if not submit_next():
+                    break
+            while pending:
+                since, future = pending.popleft()
+                objects = future.result()
+                submit_next()
+                for obj in objects:
+                    yield obj
+                objects = None
+                self._save_checkpoint(since)
+            self._save_checkpoint(self.since)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            if self.executor is None:
+                executor.shutdown(wait=False)
+
+    def _probe(self, since, until):
+        page = self.resource_class.all(
+            limit=1, since=since, until=until - 1, **self._options, **self.params
+        )
+        return page.get("count") or 0
+
+    def _fingerprint(self):
+        return {
+            "resource": self.resource_class.class_name(),
+            "since": self.since,
+            "until": self.until,
+            "params": json.dumps(self.params, sort_keys=True, default=str),
+        }
+
+    def _load_checkpoint(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return self.until
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        if state.get("export") != self._fingerprint():
+            raise ValueError(
+                "Checkpoint %s belongs to a different export." % (self.checkpoint,)
+            )
+        logger.info("Resuming export before %s", state["completed_since"])
+        return state["completed_since"]
+
+    def _save_checkpoint(self, completed_since):
+        if not self.checkpoint:
+            return
+        state = {"export": self._fingerprint(), "completed_since": completed_since}
+        tmp = self.checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint)
+
+
+def _fetch_window(resource_class, since, until, page_size, params, options):
+    # `since` and `until` are inclusive in the API; windows are half-open.
+    seen = set()
+    objects = []
+    for obj in resource_class.iterate(
+        since=since, until=until - 1, limit=page_size, **options, **params
+    ):
+        key = obj.get("id")
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        objects.append(obj)
+    return objects
+
+
+def _timestamp(value):
+    if isinstance(value, datetime.datetime):
+        return api_requestor._encode_datetime(value)
+    return int(value)
@@ -0,0 +1,42 @@
+# coding: utf-8
+
+import logging
+import threading
+
+logger = logging.getLogger("payjp")
+
+
+class Instrumentation(object):
+    """Dispatches request lifecycle events to subscribed callbacks.
+
+    Callbacks are called as `callback(event, payload)` from the thread (or
+    event loop) making the request, so they should return quickly.  The
+    requestor emits:
+
+    - "request" after every HTTP attempt, with `method`, `url`, `account`,
+      `status` and `elapsed` (seconds).
+    - "retry" before sleeping for a retry, with `method`, `url`, `attempt`
+      and `wait` (seconds).
+
+    Exceptions raised by a callback are logged and never affect the request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = ()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers = self._subscribers + (callback,)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s != callback)
+
+    def emit(self, event, payload):
+        for callback in self._subscribers:
+            try:
+                callback(event, payload)
+            except Exception:
+                logger.exception("Instrumentation callback %r failed", callback)
@@ -1,11 +1,30 @@
 # coding: utf-8
 
+import asyncio
+import functools
 import textwrap
+import threading
+import time
+from http import cookiejar
 
 import requests
+import urllib3
 
 from payjp import error
 
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Transient network failures, which a retry policy may retry.
+_RETRYABLE_REQUESTS_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+_NON_RETRYABLE_REQUESTS_ERRORS = (requests.exceptions.SSLError,)
+_TIMEOUT_REQUESTS_ERRORS = (requests.exceptions.Timeout,)
+
 
 def new_default_http_client(*args, **kwargs):
     impl = RequestsClient
@@ -13,21 +32,121 @@ def new_default_http_client(*args, **kwargs):
     return impl(*args, **kwargs)
 
 
+def new_default_async_http_client(*args, **kwargs):
+    if httpx:
+        impl = HTTPXClient
+    else:
+        impl = ThreadedAsyncClient
+
+    return impl(*args, **kwargs)
+
+
 class HTTPClient(object):
-    def request(self, method, url, headers, post_data=None):
+    """Transport used by `APIRequestor`.
+
+    `request` returns `(content, status_code, headers, timing)`: `headers`
+    is a dict of response headers with lowercased names and `timing` a dict
+    of durations in seconds (see `response.ResponseMetadata`).  Clients
+    returning just `(content, status_code)` are still supported.
+
+    When the call has a deadline, the seconds left are passed as `timeout`;
+    clients must then give up on the attempt by that time.
+    """
+
+    def request(self, method, url, headers, post_data=None, timeout=None):
         raise NotImplementedError("HTTPClient subclasses must implement `request`")
 
 
+class AsyncHTTPClient(object):
+    """Asynchronous transport; `request` returns what `HTTPClient`'s does."""
+
+    async def request(self, method, url, headers, post_data=None, timeout=None):
+        raise NotImplementedError("AsyncHTTPClient subclasses must implement `request`")
+
+    async def close(self):
+        pass
+
+
 class RequestsClient(HTTPClient):
     name = "requests"
 
-    def request(self, method, url, headers, post_data=None):
+    def __init__(
+        self,
+        session=None,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_block=False,
+        keep_alive=True,
+        verify_ssl_certs=True,
+    ):
+        """HTTP client backed by a long-lived `requests.Session`.
+
+        The session (and its urllib3 connection pool) is created lazily on the
+        first request and reused afterwards, so TCP connections and TLS
+        sessions to the API are kept alive between calls.  A single instance
+        is safe to share between threads.
+
+        `pool_connections` is the number of per-host pools to cache,
+        `pool_maxsize` the number of connections kept per host and
+        `pool_block` whether to wait for a free connection instead of opening
+        an extra one when the pool is exhausted.  Pass `keep_alive=False` to
+        close the connection after every request.
+        """
+        self._session = session
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._keep_alive = keep_alive
+        self._verify_ssl_certs = verify_ssl_certs
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def _new_session(self):
+        session = requests.Session()
+        # The API is stateless; never persist cookies across calls (and thus
+        # across API keys or accounts sharing this client).
+        session.cookies.set_policy(cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self._pool_connections,
+            pool_maxsize=self._pool_maxsize,
+            pool_block=self._pool_block,
+        )
+        _time_connections(adapter.poolmanager)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def request(self, method, url, headers, post_data=None, timeout=None):
         kwargs = {}
 
+        if not self._keep_alive:
+            headers = dict(headers, Connection="close")
+        if not self._verify_ssl_certs:
+            kwargs["verify"] = False
+
+        _connect_timing.__dict__.clear()
+        start = time.perf_counter()
         try:
             try:
-                result = requests.request(
-                    method, url, headers=headers, data=post_data, timeout=80, **kwargs
+                result = self._get_session().request(
+                    method,
+                    url,
+                    headers=headers,
+                    data=post_data,
+                    timeout=80 if timeout is None else timeout,
+                    **kwargs,
                 )
             except TypeError as e:
                 raise TypeError(
@@ -44,31 +163,220 @@ class RequestsClient(HTTPClient):
             # are susceptible to the same and should be updated.
             content = result.content
             status_code = result.status_code
+            timing = {
+                "connect": getattr(_connect_timing, "connect", None),
+                "tls": getattr(_connect_timing, "tls", None),
+                "first_byte": result.elapsed.total_seconds(),
+                "total": time.perf_counter() - start,
+            }
+            rheaders = {k.lower(): v for k, v in result.headers.items()}
         except Exception as e:
             # Would catch just requests.exceptions.RequestException, but can
             # also raise ValueError, RuntimeError, etc.
             self._handle_request_error(e)
-        return content, status_code
+        return content, status_code, rheaders, timing
 
     def _handle_request_error(self, e):
-        if isinstance(e, requests.exceptions.RequestException):
-            msg = (
-                "Unexpected error communicating with Payjp.  "
-                "If this problem persists, let us know at "
-                "support@pay.jp."
+        _raise_connection_error(
+            e,
+            isinstance(e, requests.exceptions.RequestException),
+            should_retry=isinstance(e, _RETRYABLE_REQUESTS_ERRORS)
+            and not isinstance(e, _NON_RETRYABLE_REQUESTS_ERRORS),
+            timed_out=isinstance(e, _TIMEOUT_REQUESTS_ERRORS),
+        )
+
+
+class HTTPXClient(AsyncHTTPClient):
+    name = "httpx"
+
+    def __init__(
+        self,
+        max_connections=100,
+        max_keepalive_connections=20,
+        keepalive_expiry=5.0,
+        verify_ssl_certs=True,
+    ):
+        """Non-blocking HTTP client backed by a pooled `httpx.AsyncClient`.
+
+        The underlying client is bound to the event loop it was first used
+        on; it is recreated if the instance is used from another loop.
+        """
+        if httpx is None:
+            raise ImportError(
+                'HTTPXClient requires the "httpx" library. '
+                'You can install it with "pip install httpx".'
             )
-            err = "%s: %s" % (type(e).__name__, str(e))
-        else:
-            msg = (
-                "Unexpected error communicating with Payjp. "
-                "It looks like there's probably a configuration "
-                "issue locally.  If this problem persists, let us "
-                "know at support@pay.jp."
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._verify_ssl_certs = verify_ssl_certs
+        self._client = None
+        self._loop = None
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                limits=self._limits, verify=self._verify_ssl_certs
             )
-            err = "A %s was raised" % (type(e).__name__,)
-            if str(e):
-                err += " with error message %s" % (str(e),)
-            else:
-                err += " with no error message"
-        msg = textwrap.fill(msg) + "\n\n(Network error: %s)" % (err,)
-        raise error.APIConnectionError(msg)
+            self._loop = loop
+        return self._client
+
+    async def request(self, method, url, headers, post_data=None, timeout=None):
+        marks = {}
+
+        async def trace(event, info):
+            marks[event] = time.perf_counter()
+
+        start = time.perf_counter()
+        try:
+            result = await self._get_client().request(
+                method,
+                url,
+                headers=headers,
+                content=post_data,
+                timeout=80 if timeout is None else timeout,
+                extensions={"trace": trace},
+            )
+            content = result.content
+            status_code = result.status_code
+            timing = {
+                "connect": _span(marks, "connection.connect_tcp"),
+                "tls": _span(marks, "connection.start_tls"),
+                "first_byte": _since(
+                    start,
+                    marks.get("http11.receive_response_headers.complete")
+                    or marks.get("http2.receive_response_headers.complete"),
+                ),
+                "total": time.perf_counter() - start,
+            }
+            rheaders = {k.lower(): v for k, v in result.headers.items()}
+        except Exception as e:
+            self._handle_request_error(e)
+        return content, status_code, rheaders, timing
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+    def _handle_request_error(self, e):
+        _raise_connection_error(
+            e,
+            isinstance(e, httpx.HTTPError),
+            should_retry=isinstance(e, httpx.TransportError),
+            timed_out=isinstance(e, httpx.TimeoutException),
+        )
+
+
+class ThreadedAsyncClient(AsyncHTTPClient):
+    """Adapts a blocking `HTTPClient` to the `AsyncHTTPClient` interface.
+
+    Used as the default asynchronous client when httpx isn't installed; each
+    request runs in the event loop's default executor.
+    """
+
+    def __init__(self, client=None):
+        self._client = client or new_default_http_client()
+
+    @property
+    def name(self):
+        return self._client.name
+
+    async def request(self, method, url, headers, post_data=None, timeout=None):
+        kwargs = {} if timeout is None else {"timeout": timeout}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(
+                self._client.request, method, url, headers, post_data, **kwargs
+            ),
+        )
+
+    async def close(self):
+        if hasattr(self._client, "close"):
+            self._client.close()
+
+
+# Connection setup times of the last request made by the current thread.
+_connect_timing = threading.local()
+
+
+class _TimedConnectionMixin(object):
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super(_TimedConnectionMixin, self)._new_conn()
+        finally:
+            _connect_timing.connect = time.perf_counter() - start
+
+    def connect(self):
+        start = time.perf_counter()
+        super(_TimedConnectionMixin, self).connect()
+        connect = getattr(_connect_timing, "connect", None)
+        if connect is not None and isinstance(self, urllib3.connection.HTTPSConnection):
+            _connect_timing.tls = max(0.0, time.perf_counter() - start - connect)
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, urllib3.connection.HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, urllib3.connection.HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+def _time_connections(pool_manager):
+    pool_manager.pool_classes_by_scheme = {
+        "http": _TimedHTTPConnectionPool,
+        "https": _TimedHTTPSConnectionPool,
+    }
+
+
+def _span(marks, event):
+    start = marks.get(event + ".started")
+    end = marks.get(event + ".complete")
+    if start is None or end is None:
+        return None
+    return end - start
+
+
+def _since(start, mark):
+    return None if mark is None else mark - start
+
+
+def _raise_connection_error(e, library_error, should_retry=False, timed_out=False):
+    if library_error:
+        msg = (
+            "Unexpected error communicating with Payjp.  "
+            "If this problem persists, let us know at "
+            "support@pay.jp."
+        )
+        err = "%s: %s" % (type(e).__name__, str(e))
+    else:
+        msg = (
+            "Unexpected error communicating with Payjp. "
+            "It looks like there's probably a configuration "
+            "issue locally.  If this problem persists, let us "
+            "know at support@pay.jp."
+        )
+        err = "A %s was raised" % (type(e).__name__,)
+        if str(e):
+            err += " with error message %s" % (str(e),)
+        else:
+            err += " with no error message"
+    msg = textwrap.fill(msg) + "\n\n(Network error: %s)" % (err,)
+    if timed_out:
+        raise error.APITimeoutError(msg, should_retry=should_retry)
+    raise error.APIConnectionError(msg, should_retry=should_retry)
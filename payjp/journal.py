@@ -0,0 +1,209 @@
+# coding: utf-8
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from payjp import error
+from payjp.batch import BatchExecutor
+
+logger = logging.getLogger("payjp")
+
+STARTED = "started"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Journal(object):
+    """Append-only on-disk record of the items of a bulk job.
+
+    Every item is identified by a key of the caller's choosing (a charge id,
+    a row number...).  Its idempotency key is derived from the job name and
+    the item key, so it is the same each time the job runs.  The journal
+    stores one JSON line per event: the item was started, or it succeeded or
+    failed with the given outcome.
+
+    Opening an existing journal replays it, and `run` then skips items that
+    already have an outcome.  Items that were started without a recorded
+    outcome are in doubt: their request may or may not have reached PAY.JP.
+    They are sent again with the same `Idempotency-Key`, so PAY.JP applies
+    them at most once.  This is also why the journal only fsyncs every
+    `fsync_every` records or `fsync_interval` seconds: a record lost in a
+    crash merely turns an item back into an in-doubt one.
+
+        with Journal("refunds.journal", job="refunds-2024-01") as journal:
+            def refund(charge_id, headers):
+                return payjp.Charge.retrieve(charge_id).refund(headers=headers)
+
+            for result in journal.run(charge_ids, refund, workers=8):
+                ...
+
+    PAY.JP only remembers idempotency keys for a limited time, so resume an
+    interrupted job promptly.
+    """
+
+    def __init__(self, path, job, fsync_every=100, fsync_interval=1.0):
+        self.path = path
+        self.job = job
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.skipped = 0
+        self._states = {}
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        torn = self._load()
+        self._file = open(path, "a", encoding="utf-8")
+        if torn:
+            self._file.write("\n")
+
+    def idempotency_key(self, item_key):
+        digest = hashlib.sha256(
+            ("%s\0%s" % (self.job, item_key)).encode("utf-8")
+        ).hexdigest()
+        return "payjp-python-%s" % digest[:48]
+
+    def status(self, item_key):
+        """`STARTED`, `SUCCEEDED`, `FAILED`, or None if never started."""
+        state = self._states.get(str(item_key))
+        return state and state["status"]
+
+    def outcome(self, item_key):
+        """The last record of an item, or None if never started."""
+        return self._states.get(str(item_key))
+
+    def in_doubt(self):
+        """Keys of the items started without a recorded outcome."""
+        return [k for k, s in self._states.items() if s["status"] == STARTED]
+
+    def start(self, item_key, operation=None):
+        """Record that an item is being sent; returns its idempotency key."""
+        key = self.idempotency_key(item_key)
+        self._append(
+            {
+                "item": str(item_key),
+                "status": STARTED,
+                "operation": operation,
+                "idempotency_key": key,
+            }
+        )
+        return key
+
+    def succeed(self, item_key, result=None):
+        record = {"item": str(item_key), "status": SUCCEEDED}
+        if isinstance(result, dict) and result.get("id") is not None:
+            record["id"] = result["id"]
+        self._append(record)
+
+    def fail(self, item_key, exc):
+        self._append(
+            {
+                "item": str(item_key),
+                "status": FAILED,
+                "error": type(exc).__name__,
+                "message": str(exc),
+                "http_status": getattr(exc, "http_status", None),
+            }
+        )
+
+    def run(self, items, operation, key=str, name=None, **batch_options):
+        """Run `operation(item, headers)` for every unfinished item.
+
+        `headers` carries the item's `Idempotency-Key` and must be passed
+        to the API call.  Items are run by a `batch.BatchExecutor` created
+        with `batch_options` and a `batch.BatchResult` is yielded for each
+        item run; finished items are skipped and counted in `skipped`.
+        """
+        name = name or getattr(operation, "__name__", None)
+
+        def operations():
+            for item in items:
+                item_key = key(item)
+                if self.status(item_key) in (SUCCEEDED, FAILED):
+                    self.skipped += 1
+                    continue
+                yield _JournaledOperation(self, item, item_key, operation, name)
+
+        return BatchExecutor(**batch_options).run(operations())
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _append(self, record):
+        record["at"] = int(time.time())
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._states[record["item"]] = record
+            self._unsynced += 1
+            if (
+                self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval
+            ):
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _load(self):
+        """Replay the journal; returns whether its last line is torn."""
+        if not os.path.exists(self.path):
+            return False
+        line = ""
+        with open(self.path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line torn by a crash; the item is replayed.
+                    logger.warning(
+                        "Ignoring torn journal line %d of %s", number, self.path
+                    )
+                    continue
+                self._states[record["item"]] = record
+        logger.info(
+            "Loaded journal %s: %d items, %d in doubt",
+            self.path,
+            len(self._states),
+            len(self.in_doubt()),
+        )
+        return bool(line) and not line.endswith("\n")
+
+
+class _JournaledOperation(object):
+    def __init__(self, journal, item, item_key, operation, name):
+        self.journal = journal
+        self.item = item
+        self.item_key = item_key
+        self.operation = operation
+        self.name = name
+
+    def __call__(self):
+        key = self.journal.start(self.item_key, self.name)
+        try:
+            result = self.operation(self.item, {"Idempotency-Key": key})
+        except (error.CardError, error.InvalidRequestError) as e:
+            # Definite rejections.  Any other error leaves the item in doubt.
+            self.journal.fail(self.item_key, e)
+            raise
+        self.journal.succeed(self.item_key, result)
+        return result
@@ -0,0 +1,179 @@
+# coding: utf-8
+
+import asyncio
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PAGE_SIZE = 100
+
+
+class ListIterator(object):
+    """Lazily yields the items of a list endpoint, one page at a time.
+
+    Only the page being consumed is held in memory.  Pages are requested with
+    `limit`/`offset`; unless the caller passes `until`, it is pinned to the
+    `created` time of the newest item on the first page so objects created
+    while iterating don't shift the offsets of later pages.
+
+    `cursor` describes the position after the last item yielded and can be
+    passed back as `cursor=` to resume an interrupted iteration.  The
+    iterator can be consumed with `for` or, for asyncio code, `async for`.
+
+    `first_page` is an already fetched page for `params`; its items are
+    yielded before any further page is requested.
+    """
+
+    def __init__(
+        self, fetch_page, params=None, cursor=None, afetch_page=None, first_page=None
+    ):
+        self._fetch_page = fetch_page
+        self._afetch_page = afetch_page
+        self._params = dict(params or {})
+        self._params.setdefault("limit", DEFAULT_PAGE_SIZE)
+        self._params.setdefault("offset", 0)
+        if cursor:
+            self._params.update(cursor)
+        self._first_page = first_page
+        self._done = False
+
+    @property
+    def cursor(self):
+        """Parameters resuming the iteration after the last yielded item."""
+        return dict(self._params)
+
+    def __iter__(self):
+        while not self._done:
+            page = self._first_page
+            if page is None:
+                page = self._fetch_page(dict(self._params))
+            self._first_page = None
+            items = self._start_page(page)
+            # Drop the page object; only its data list is kept while yielding.
+            page = None
+            for item in items:
+                self._params["offset"] += 1
+                yield item
+
+    async def __aiter__(self):
+        if self._afetch_page is None:
+            raise TypeError("This iterator doesn't support asynchronous iteration.")
+        while not self._done:
+            page = self._first_page
+            if page is None:
+                page = await self._afetch_page(dict(self._params))
+            self._first_page = None
+            items = self._start_page(page)
+            page = None
+            for item in items:
+                self._params["offset"] += 1
+                yield item
+
+    def _start_page(self, page):
+        items = page.get("data") or []
+        if "until" not in self._params and items:
+            created = items[0].get("created")
+            if created is not None:
+                self._params["until"] = created
+        if not items or not page.get("has_more"):
+            self._done = True
+        return items
+
+
+class ParallelListIterator(ListIterator):
+    """`ListIterator` that prefetches pages concurrently.
+
+    The `count` of the first page gives the full offset range, so the
+    following pages are requested by up to `workers` threads (or asyncio
+    tasks) at once.  Items are still yielded in order, and at most `workers`
+    pages are buffered ahead of the consumer.  If the listing turns out
+    longer than announced, the remaining pages are fetched sequentially.
+
+    Requests go through the usual requestors, so they share the pooled HTTP
+    client and respect `payjp.concurrency_limiter`.
+    """
+
+    def __init__(
+        self, fetch_page, params=None, cursor=None, afetch_page=None, workers=4
+    ):
+        super(ParallelListIterator, self).__init__(
+            fetch_page, params, cursor=cursor, afetch_page=afetch_page
+        )
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self._workers = workers
+
+    def __iter__(self):
+        first = self._fetch_page(dict(self._params))
+        pages = self._remaining_pages(first)
+        items = self._start_page(first)
+        first = None
+
+        executor = ThreadPoolExecutor(max_workers=self._workers)
+        pending = collections.deque()
+        try:
+            for params in pages:
+                pending.append(executor.submit(self._fetch_page, params))
+                if len(pending) >= self._workers:
+                    break
+            while True:
+                for item in items:
+                    self._params["offset"] += 1
+                    yield item
+                if not pending:
+                    break
+                page = pending.popleft().result()
+                for params in pages:
+                    pending.append(executor.submit(self._fetch_page, params))
+                    break
+                items = self._start_page(page)
+                page = None
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        yield from super(ParallelListIterator, self).__iter__()
+
+    async def __aiter__(self):
+        if self._afetch_page is None:
+            raise TypeError("This iterator doesn't support asynchronous iteration.")
+        first = await self._afetch_page(dict(self._params))
+        pages = self._remaining_pages(first)
+        items = self._start_page(first)
+        first = None
+
+        pending = collections.deque()
+        try:
+            for params in pages:
+                pending.append(asyncio.ensure_future(self._afetch_page(params)))
+                if len(pending) >= self._workers:
+                    break
+            while True:
+                for item in items:
+                    self._params["offset"] += 1
+                    yield item
+                if not pending:
+                    break
+                page = await pending.popleft()
+                for params in pages:
+                    pending.append(asyncio.ensure_future(self._afetch_page(params)))
+                    break
+                items = self._start_page(page)
+                page = None
+        finally:
+            for task in pending:
+                task.cancel()
+
+        async for item in super(ParallelListIterator, self).__aiter__():
+            yield item
+
+    def _remaining_pages(self, first):
+        """Yield request parameters for the pages after `first`."""
+        count = first.get("count")
+        if not first.get("has_more") or not isinstance(count, int):
+            return
+        # Runs after `_start_page(first)`, so `until` is already pinned.
+        limit = self._params["limit"]
+        params = dict(self._params)
+        for offset in range(params["offset"] + limit, count, limit):
+            yield dict(params, offset=offset)
@@ -0,0 +1,125 @@
+# coding: utf-8
+
+import asyncio
+import threading
+import time
+
+from payjp import error
+
+READ = "read"
+WRITE = "write"
+
+
+class TokenBucket(object):
+    """Admits `rate` requests per second with bursts of up to `burst`.
+
+    `reserve` takes a token and returns how long the caller must wait for
+    it.  The balance may go negative, which queues callers in order of
+    arrival without them having to poll.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """Take a token; returns the seconds to wait before using it.
+
+        If the wait would exceed `max_wait`, no token is taken and None is
+        returned.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    @property
+    def tokens(self):
+        with self._lock:
+            elapsed = self._clock() - self._updated
+            return min(self.burst, self._tokens + elapsed * self.rate)
+
+
+class RateLimiter(object):
+    """Client-side rate limit applied before requests are sent.
+
+    Install one as `payjp.rate_limiter` (or pass it to `payjp.Client`) and
+    every request takes a token from a bucket keyed by API key,
+    `Payjp-Account` and family -- GETs are reads, everything else writes --
+    so each budget is shared by all threads of the process.
+
+    By default a request waits for its token, queuing bursts instead of
+    letting them run into 429s.  A request that would have to wait longer
+    than `max_wait` seconds is shed instead: it fails with
+    `error.RateLimitError` without being sent.  `max_wait=0` never waits.
+
+        payjp.rate_limiter = RateLimiter(read_rate=10, write_rate=5, max_wait=2)
+    """
+
+    def __init__(
+        self,
+        read_rate=10,
+        write_rate=10,
+        read_burst=None,
+        write_burst=None,
+        max_wait=None,
+        clock=time.monotonic,
+    ):
+        self.read_rate = read_rate
+        self.write_rate = write_rate
+        self.read_burst = read_burst
+        self.write_burst = write_burst
+        self.max_wait = max_wait
+        self._clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, api_key, account, family):
+        key = (api_key, account, family)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    if family == READ:
+                        rate, burst = self.read_rate, self.read_burst
+                    else:
+                        rate, burst = self.write_rate, self.write_burst
+                    bucket = TokenBucket(rate, burst, clock=self._clock)
+                    self._buckets[key] = bucket
+        return bucket
+
+    def reserve(self, api_key, account, method):
+        """Seconds to wait before sending; raises if the call is shed."""
+        family = READ if method.lower() == "get" else WRITE
+        wait = self.bucket(api_key, account, family).reserve(self.max_wait)
+        if wait is None:
+            raise error.RateLimitError(
+                "Client-side %s rate limit exceeded; request was not sent." % (family,)
+            )
+        return wait
+
+    def acquire(self, api_key, account, method):
+        wait = self.reserve(api_key, account, method)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, api_key, account, method):
+        wait = self.reserve(api_key, account, method)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
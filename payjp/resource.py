@@ -5,12 +5,12 @@ import logging
 import sys
 from urllib.parse import quote_plus
 
-from payjp import api_requestor, error
+from payjp import api_requestor, error, pagination
 
 logger = logging.getLogger("payjp")
 
 
-def convert_to_payjp_object(resp, api_key, account, api_base=None):
+def convert_to_payjp_object(resp, api_key, account, api_base=None, payjp_client=None):
     types = {
         "account": Account,
         "card": Card,
@@ -29,21 +29,44 @@ def convert_to_payjp_object(resp, api_key, account, api_base=None):
     }
 
     if isinstance(resp, list):
-        return [convert_to_payjp_object(i, api_key, account, api_base) for i in resp]
+        return [
+            convert_to_payjp_object(i, api_key, account, api_base, payjp_client)
+            for i in resp
+        ]
     elif isinstance(resp, dict) and not isinstance(resp, PayjpObject):
+        metadata = getattr(resp, "metadata", None)
         resp = resp.copy()
         klass_name = resp.get("object")
         if isinstance(klass_name, str):
             klass = types.get(klass_name, PayjpObject)
         else:
             klass = PayjpObject
-        return klass.construct_from(
-            resp, api_key, payjp_account=account, api_base=api_base
+        obj = klass.construct_from(
+            resp,
+            api_key,
+            payjp_account=account,
+            api_base=api_base,
+            payjp_client=payjp_client,
         )
+        if metadata is not None:
+            obj._last_response = metadata
+        return obj
     else:
         return resp
 
 
+def _new_requestor(payjp_client, *args, **kwargs):
+    if payjp_client is not None:
+        return payjp_client.requestor(*args, **kwargs)
+    return api_requestor.APIRequestor(*args, **kwargs)
+
+
+def _new_async_requestor(payjp_client, *args, **kwargs):
+    if payjp_client is not None:
+        return payjp_client.async_requestor(*args, **kwargs)
+    return api_requestor.AsyncAPIRequestor(*args, **kwargs)
+
+
 def _compute_diff(current, previous):
     if isinstance(current, dict):
         previous = previous or {}
@@ -70,8 +93,17 @@ def _serialize_list(array, previous):
 
 
 class PayjpObject(dict):
+    payjp_client = None
+    _last_response = None
+
     def __init__(
-        self, id=None, api_key=None, payjp_account=None, api_base=None, **kwargs
+        self,
+        id=None,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **kwargs,
     ):
         super(PayjpObject, self).__init__()
 
@@ -84,6 +116,7 @@ class PayjpObject(dict):
 
         object.__setattr__(self, "api_key", api_key)
         object.__setattr__(self, "payjp_account", payjp_account)
+        object.__setattr__(self, "payjp_client", payjp_client)
 
         if id:
             self["id"] = id
@@ -140,21 +173,56 @@ class PayjpObject(dict):
             "To unset a property, set it to None."
         )
 
+    @property
+    def last_response(self):
+        """`response.ResponseMetadata` of the response this object came from."""
+        return self._last_response
+
+    def __getstate__(self):
+        # The client owns connection pools and locks; don't pickle it.
+        state = self.__dict__.copy()
+        state.pop("payjp_client", None)
+        return state
+
     @classmethod
-    def construct_from(cls, values, key, payjp_account=None, api_base=None):
-        instance = cls(values.get("id"), api_key=key, payjp_account=payjp_account)
+    def construct_from(
+        cls, values, key, payjp_account=None, api_base=None, payjp_client=None
+    ):
+        instance = cls(
+            values.get("id"),
+            api_key=key,
+            payjp_account=payjp_account,
+            payjp_client=payjp_client,
+        )
         instance.refresh_from(
-            values, api_key=key, payjp_account=payjp_account, api_base=api_base
+            values,
+            api_key=key,
+            payjp_account=payjp_account,
+            api_base=api_base,
+            payjp_client=payjp_client,
         )
         return instance
 
     def refresh_from(
-        self, values, api_key=None, partial=False, payjp_account=None, api_base=None
+        self,
+        values,
+        api_key=None,
+        partial=False,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
     ):
         self.api_key = api_key or getattr(values, "api_key", None)
         self.payjp_account = payjp_account or getattr(values, "payjp_account", None)
+        object.__setattr__(
+            self,
+            "payjp_client",
+            payjp_client or getattr(values, "payjp_client", None),
+        )
         if self.api_base is not None:
             self._api_base = api_base
+        if getattr(values, "_last_response", None) is not None:
+            self._last_response = values._last_response
 
         # Wipe old state before setting new.  This is useful for e.g.
         # updating a customer, where there is no persistent card
@@ -171,7 +239,10 @@ class PayjpObject(dict):
 
         for k, v in values.items():
             super(PayjpObject, self).__setitem__(
-                k, convert_to_payjp_object(v, api_key, payjp_account, api_base)
+                k,
+                convert_to_payjp_object(
+                    v, api_key, payjp_account, api_base, payjp_client
+                ),
             )
 
         self._previous = values
@@ -201,13 +272,31 @@ class PayjpObject(dict):
     def request(self, method, url, params=None, headers=None):
         if params is None:
             params = self._retrieve_params
-        requestor = api_requestor.APIRequestor(
-            key=self.api_key, api_base=self.api_base(), account=self.payjp_account
+        requestor = _new_requestor(
+            self.payjp_client,
+            key=self.api_key,
+            api_base=self.api_base(),
+            account=self.payjp_account,
         )
         response, api_key = requestor.request(method, url, params, headers)
 
         return convert_to_payjp_object(
-            response, api_key, self.payjp_account, self.api_base()
+            response, api_key, self.payjp_account, self.api_base(), self.payjp_client
+        )
+
+    async def arequest(self, method, url, params=None, headers=None):
+        if params is None:
+            params = self._retrieve_params
+        requestor = _new_async_requestor(
+            self.payjp_client,
+            key=self.api_key,
+            api_base=self.api_base(),
+            account=self.payjp_account,
+        )
+        response, api_key = await requestor.request(method, url, params, headers)
+
+        return convert_to_payjp_object(
+            response, api_key, self.payjp_account, self.api_base(), self.payjp_client
         )
 
     def __repr__(self):
@@ -238,7 +327,34 @@ class ListObject(PayjpObject):
     def all(self, **params):
         return self.request("get", self["url"], params)
 
+    async def aall(self, **params):
+        return await self.arequest("get", self["url"], params)
+
+    def auto_paging_iter(self, **params):
+        """Iterate over this list's items, fetching further pages lazily.
+
+        `params` should be the parameters this page was fetched with; its
+        items are yielded first, then the following pages are requested.
+        """
+        data = self.get("data")
+        if data:
+            params.setdefault("limit", len(data))
+        return pagination.ListIterator(
+            lambda page_params: self.all(**page_params),
+            params,
+            afetch_page=lambda page_params: self.aall(**page_params),
+            first_page=self,
+        )
+
     def create(self, **params):
+        self._check_creatable()
+        return self.request("post", self["url"], params)
+
+    async def acreate(self, **params):
+        self._check_creatable()
+        return await self.arequest("post", self["url"], params)
+
+    def _check_creatable(self):
         # TODO divide into another parent class
         if (
             hasattr(self, "object")
@@ -251,14 +367,17 @@ class ListObject(PayjpObject):
                 "Can't create a subscription via customer object. "
                 "Use payjp.Subscription.create({'customer_id'}) instead."
             )
-        return self.request("post", self["url"], params)
 
     def retrieve(self, id, **params):
+        return self.request("get", self._item_url(id), params)
+
+    async def aretrieve(self, id, **params):
+        return await self.arequest("get", self._item_url(id), params)
+
+    def _item_url(self, id):
         base = self.get("url")
         extn = quote_plus(id)
-        url = "%s/%s" % (base, extn)
-
-        return self.request("get", url, params)
+        return "%s/%s" % (base, extn)
 
 
 class APIResource(PayjpObject):
@@ -283,50 +402,192 @@ class APIResource(PayjpObject):
         return "{0}/{1}".format(base, ext)
 
     @classmethod
-    def retrieve(cls, id, api_key=None, payjp_account=None, api_base=None, **kwargs):
-        instance = cls(id, api_key, payjp_account, api_base, **kwargs)
+    def retrieve(
+        cls,
+        id,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **kwargs,
+    ):
+        instance = cls(id, api_key, payjp_account, api_base, payjp_client, **kwargs)
         instance.refresh()
         return instance
 
+    @classmethod
+    async def aretrieve(
+        cls,
+        id,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **kwargs,
+    ):
+        instance = cls(id, api_key, payjp_account, api_base, payjp_client, **kwargs)
+        await instance.arefresh()
+        return instance
+
     def refresh(self):
         self.refresh_from(self.request("get", self.instance_url()))
         return self
 
+    async def arefresh(self):
+        self.refresh_from(await self.arequest("get", self.instance_url()))
+        return self
+
 
 class ListableAPIResource(APIResource):
     @classmethod
-    def all(cls, api_key=None, payjp_account=None, api_base=None, **params):
-        requestor = api_requestor.APIRequestor(
-            api_key, account=payjp_account, api_base=api_base
+    def all(
+        cls,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
+    ):
+        requestor = _new_requestor(
+            payjp_client, api_key, account=payjp_account, api_base=api_base
         )
         url = cls.class_url()
         response, api_key = requestor.request("get", url, params)
-        return convert_to_payjp_object(response, api_key, payjp_account, api_base)
+        return convert_to_payjp_object(
+            response, api_key, payjp_account, api_base, payjp_client
+        )
+
+    @classmethod
+    async def aall(
+        cls,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
+    ):
+        requestor = _new_async_requestor(
+            payjp_client, api_key, account=payjp_account, api_base=api_base
+        )
+        url = cls.class_url()
+        response, api_key = await requestor.request("get", url, params)
+        return convert_to_payjp_object(
+            response, api_key, payjp_account, api_base, payjp_client
+        )
+
+    @classmethod
+    def iterate(
+        cls,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        cursor=None,
+        workers=None,
+        **params,
+    ):
+        """Lazily iterate over every object matching `params`.
+
+        `limit` sets the page size (100 by default).  See
+        `pagination.ListIterator` for resuming with `cursor`.  With
+        `workers` greater than 1, pages are prefetched concurrently by a
+        `pagination.ParallelListIterator`.
+        """
+        options = dict(
+            api_key=api_key,
+            payjp_account=payjp_account,
+            api_base=api_base,
+            payjp_client=payjp_client,
+        )
+
+        def fetch_page(page_params):
+            return cls.all(**options, **page_params)
+
+        def afetch_page(page_params):
+            return cls.aall(**options, **page_params)
+
+        if workers is not None and workers > 1:
+            return pagination.ParallelListIterator(
+                fetch_page,
+                params,
+                cursor=cursor,
+                afetch_page=afetch_page,
+                workers=workers,
+            )
+        return pagination.ListIterator(
+            fetch_page, params, cursor=cursor, afetch_page=afetch_page
+        )
 
 
 class CreateableAPIResource(APIResource):
     @classmethod
-    def create(cls, api_key=None, payjp_account=None, headers=None, **params):
-        requestor = api_requestor.APIRequestor(api_key, account=payjp_account)
+    def create(
+        cls,
+        api_key=None,
+        payjp_account=None,
+        headers=None,
+        payjp_client=None,
+        **params,
+    ):
+        requestor = _new_requestor(payjp_client, api_key, account=payjp_account)
         url = cls.class_url()
         response, api_key = requestor.request("post", url, params, headers)
-        return convert_to_payjp_object(response, api_key, payjp_account)
+        return convert_to_payjp_object(
+            response, api_key, payjp_account, payjp_client=payjp_client
+        )
+
+    @classmethod
+    async def acreate(
+        cls,
+        api_key=None,
+        payjp_account=None,
+        headers=None,
+        payjp_client=None,
+        **params,
+    ):
+        requestor = _new_async_requestor(payjp_client, api_key, account=payjp_account)
+        url = cls.class_url()
+        response, api_key = await requestor.request("post", url, params, headers)
+        return convert_to_payjp_object(
+            response, api_key, payjp_account, payjp_client=payjp_client
+        )
 
 
 class UpdateableAPIResource(APIResource):
-    def save(self):
+    def save(self, headers=None):
         updated_params = self.serialize(None)
 
         if updated_params:
-            self.refresh_from(self.request("post", self.instance_url(), updated_params))
+            self.refresh_from(
+                self.request("post", self.instance_url(), updated_params, headers)
+            )
+        else:
+            logger.debug("Trying to save already saved object %r", self)
+        return self
+
+    async def asave(self, headers=None):
+        updated_params = self.serialize(None)
+
+        if updated_params:
+            self.refresh_from(
+                await self.arequest(
+                    "post", self.instance_url(), updated_params, headers
+                )
+            )
         else:
             logger.debug("Trying to save already saved object %r", self)
         return self
 
 
 class DeletableAPIResource(APIResource):
-    def delete(self, **params):
-        self.refresh_from(self.request("delete", self.instance_url(), params))
+    def delete(self, headers=None, **params):
+        self.refresh_from(self.request("delete", self.instance_url(), params, headers))
+        return self
+
+    async def adelete(self, headers=None, **params):
+        self.refresh_from(
+            await self.arequest("delete", self.instance_url(), params, headers)
+        )
         return self
 
 
@@ -334,31 +595,56 @@ class DeletableAPIResource(APIResource):
 
 
 class Token(CreateableAPIResource):
-    def tds_finish(self, **kwargs):
+    def tds_finish(self, headers=None, **kwargs):
+        url = self.instance_url() + "/tds_finish"
+        self.refresh_from(self.request("post", url, kwargs, headers))
+        return self
+
+    async def atds_finish(self, headers=None, **kwargs):
         url = self.instance_url() + "/tds_finish"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
         return self
 
 
 class Charge(CreateableAPIResource, ListableAPIResource, UpdateableAPIResource):
-    def capture(self, **kwargs):
+    def capture(self, headers=None, **kwargs):
         url = self.instance_url() + "/capture"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(self.request("post", url, kwargs, headers))
         return self
 
-    def refund(self, **kwargs):
+    async def acapture(self, headers=None, **kwargs):
+        url = self.instance_url() + "/capture"
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
+        return self
+
+    def refund(self, headers=None, **kwargs):
+        url = self.instance_url() + "/refund"
+        self.refresh_from(self.request("post", url, kwargs, headers))
+        return self
+
+    async def arefund(self, headers=None, **kwargs):
         url = self.instance_url() + "/refund"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
         return self
 
-    def reauth(self, **kwargs):
+    def reauth(self, headers=None, **kwargs):
         url = self.instance_url() + "/reauth"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(self.request("post", url, kwargs, headers))
         return self
 
-    def tds_finish(self, **kwargs):
+    async def areauth(self, headers=None, **kwargs):
+        url = self.instance_url() + "/reauth"
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
+        return self
+
+    def tds_finish(self, headers=None, **kwargs):
+        url = self.instance_url() + "/tds_finish"
+        self.refresh_from(self.request("post", url, kwargs, headers))
+        return self
+
+    async def atds_finish(self, headers=None, **kwargs):
         url = self.instance_url() + "/tds_finish"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
         return self
 
 
@@ -390,12 +676,32 @@ class Plan(
 class Account(APIResource):
     @classmethod
     def retrieve(
-        cls, id=None, api_key=None, payjp_account=None, api_base=None, **params
+        cls,
+        id=None,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
     ):
-        instance = cls(id, api_key, payjp_account, api_base, **params)
+        instance = cls(id, api_key, payjp_account, api_base, payjp_client, **params)
         instance.refresh()
         return instance
 
+    @classmethod
+    async def aretrieve(
+        cls,
+        id=None,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
+    ):
+        instance = cls(id, api_key, payjp_account, api_base, payjp_client, **params)
+        await instance.arefresh()
+        return instance
+
     def instance_url(self):
         id = self.get("id")
         if not id:
@@ -423,13 +729,36 @@ class Card(UpdateableAPIResource, DeletableAPIResource):
         return "%s/%s/cards/%s" % (base, owner_extn, extn)
 
     @classmethod
-    def retrieve(cls, id, api_key=None, payjp_account=None, api_base=None, **params):
+    def retrieve(
+        cls,
+        id,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
+    ):
         raise NotImplementedError(
             "Can't retrieve a card without a customer ID."
             "Use customer.cards.retrieve('card_id') or "
             "recipient.cards.retrieve('card_id') instead."
         )
 
+    @classmethod
+    async def aretrieve(
+        cls,
+        id,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
+    ):
+        raise NotImplementedError(
+            "Can't retrieve a card without a customer ID."
+            "Use customer.cards.aretrieve('card_id') instead."
+        )
+
 
 class Subscription(
     CreateableAPIResource,
@@ -437,19 +766,34 @@ class Subscription(
     UpdateableAPIResource,
     ListableAPIResource,
 ):
-    def pause(self, **kwargs):
+    def pause(self, headers=None, **kwargs):
+        url = self.instance_url() + "/pause"
+        self.refresh_from(self.request("post", url, kwargs, headers))
+        return self
+
+    async def apause(self, headers=None, **kwargs):
         url = self.instance_url() + "/pause"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
         return self
 
-    def resume(self, **kwargs):
+    def resume(self, headers=None, **kwargs):
         url = self.instance_url() + "/resume"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(self.request("post", url, kwargs, headers))
         return self
 
-    def cancel(self, **kwargs):
+    async def aresume(self, headers=None, **kwargs):
+        url = self.instance_url() + "/resume"
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
+        return self
+
+    def cancel(self, headers=None, **kwargs):
         url = self.instance_url() + "/cancel"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(self.request("post", url, kwargs, headers))
+        return self
+
+    async def acancel(self, headers=None, **kwargs):
+        url = self.instance_url() + "/cancel"
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
         return self
 
 
@@ -458,9 +802,14 @@ class Transfer(ListableAPIResource):
 
 
 class Statement(ListableAPIResource):
-    def statement_urls(self, **kwargs):
+    def statement_urls(self, headers=None, **kwargs):
+        url = self.instance_url() + "/statement_urls"
+        self.refresh_from(self.request("post", url, kwargs, headers))
+        return self
+
+    async def astatement_urls(self, headers=None, **kwargs):
         url = self.instance_url() + "/statement_urls"
-        self.refresh_from(self.request("post", url, kwargs))
+        self.refresh_from(await self.arequest("post", url, kwargs, headers))
         return self
 
 
@@ -472,20 +821,55 @@ class Balance(ListableAPIResource):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         object.__setattr__(self, "statement_urls", self.__statement_urls)
+        object.__setattr__(self, "astatement_urls", self.__astatement_urls)
 
     def __statement_urls(self, *args, **kwargs):
+        if self.payjp_client is not None:
+            kwargs.setdefault("payjp_client", self.payjp_client)
         return self.__class__.statement_urls(self.get("id"), *args, **kwargs)
 
+    def __astatement_urls(self, *args, **kwargs):
+        if self.payjp_client is not None:
+            kwargs.setdefault("payjp_client", self.payjp_client)
+        return self.__class__.astatement_urls(self.get("id"), *args, **kwargs)
+
     @classmethod
     def statement_urls(
-        cls, id, api_key=None, payjp_account=None, api_base=None, **params
+        cls,
+        id,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
     ):
-        requestor = api_requestor.APIRequestor(
-            api_key, account=payjp_account, api_base=api_base
+        requestor = _new_requestor(
+            payjp_client, api_key, account=payjp_account, api_base=api_base
         )
         url = cls.class_url() + f"/{id}/statement_urls"
         response, api_key = requestor.request("post", url, params)
-        return convert_to_payjp_object(response, api_key, payjp_account, api_base)
+        return convert_to_payjp_object(
+            response, api_key, payjp_account, api_base, payjp_client
+        )
+
+    @classmethod
+    async def astatement_urls(
+        cls,
+        id,
+        api_key=None,
+        payjp_account=None,
+        api_base=None,
+        payjp_client=None,
+        **params,
+    ):
+        requestor = _new_async_requestor(
+            payjp_client, api_key, account=payjp_account, api_base=api_base
+        )
+        url = cls.class_url() + f"/{id}/statement_urls"
+        response, api_key = await requestor.request("post", url, params)
+        return convert_to_payjp_object(
+            response, api_key, payjp_account, api_base, payjp_client
+        )
 
 
 class ThreeDSecureRequest(CreateableAPIResource, ListableAPIResource):
@@ -0,0 +1,79 @@
+# coding: utf-8
+
+import email.utils
+import time
+
+
+class ResponseMetadata(object):
+    """What is known about an HTTP response besides its body.
+
+    `headers` is a dict with lowercased names.  `timing` holds durations in
+    seconds: `connect` and `tls` (None when a pooled connection was reused
+    or the transport can't tell), `first_byte` (until the response headers
+    were received) and `total`.  `retries` is the number of attempts made
+    before this response.
+    """
+
+    REQUEST_ID_HEADERS = ("payjp-request-id", "x-request-id", "request-id")
+
+    def __init__(self, method, url, status, headers=None, timing=None, retries=0):
+        self.method = method
+        self.url = url
+        self.status = status
+        self.headers = headers or {}
+        self.timing = timing or {}
+        self.retries = retries
+
+    @property
+    def request_id(self):
+        for name in self.REQUEST_ID_HEADERS:
+            if name in self.headers:
+                return self.headers[name]
+        return None
+
+    @property
+    def retry_after(self):
+        """Seconds the server asked us to wait before retrying, if any."""
+        value = self.headers.get("retry-after")
+        if value is not None:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+            try:
+                date = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                date = None
+            if date is not None:
+                return max(0.0, date.timestamp() - time.time())
+        for name in ("ratelimit-reset", "x-ratelimit-reset"):
+            value = self.headers.get(name)
+            if value is None:
+                continue
+            try:
+                reset = float(value)
+            except ValueError:
+                continue
+            # Either a delay or, for large values, an epoch timestamp.
+            if reset > 1e9:
+                reset -= time.time()
+            return max(0.0, reset)
+        return None
+
+    def __repr__(self):
+        return "<ResponseMetadata %s %s %s request_id=%s retries=%d total=%s>" % (
+            self.method.upper(),
+            self.url,
+            self.status,
+            self.request_id,
+            self.retries,
+            self.timing.get("total"),
+        )
+
+
+class PayjpResponse(dict):
+    """Decoded response body carrying its `ResponseMetadata`."""
+
+    def __init__(self, values, metadata=None):
+        super(PayjpResponse, self).__init__(values)
+        self.metadata = metadata
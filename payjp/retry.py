@@ -0,0 +1,105 @@
+# coding: utf-8
+
+import threading
+import time
+
+
+class RetryBudget(object):
+    """Caps retries at a fraction of first attempts.
+
+    Each first attempt deposits `ratio` tokens and each retry withdraws
+    one, so retries can add at most `ratio` times the normal load -- plus
+    `min_per_second` retries per second so that low-traffic processes can
+    still retry.  The budget starts full and saves up at most `max_tokens`,
+    which absorbs short bursts of failures.
+
+    One budget is shared by every requestor using the same `RetryPolicy`,
+    so when the API is failing, the fleet's retries stop amplifying the
+    incident once the budget is spent.
+    """
+
+    def __init__(
+        self, ratio=0.2, min_per_second=10.0, max_tokens=100, clock=time.monotonic
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._tokens = float(max_tokens)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def record_attempt(self):
+        with self._lock:
+            self._deposit(self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            self._deposit(0)
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._deposit(0)
+            return self._tokens
+
+    def _deposit(self, amount):
+        now = self._clock()
+        amount += (now - self._updated) * self.min_per_second
+        self._updated = now
+        self._tokens = min(self.max_tokens, self._tokens + amount)
+
+
+class RetryPolicy(object):
+    """Decides which failed requests are retried.
+
+    429 responses are always safe to retry: the request was not processed.
+    Server errors (`statuses`) and connection errors flagged with
+    `should_retry` are retried only for requests that can't be applied
+    twice: GETs and DELETEs, and POSTs carrying an `Idempotency-Key`
+    header.  Every retry is paid for from `budget`, if any.
+
+    The number of attempts is still bounded by `payjp.max_retry` (or the
+    client's `retry`), and delays by the usual backoff settings.
+    """
+
+    RATE_LIMITED = 429
+    SERVER_ERRORS = frozenset([500, 502, 503, 504])
+    IDEMPOTENT_METHODS = frozenset(["get", "delete"])
+
+    def __init__(self, statuses=None, connection_errors=True, budget=None):
+        self.statuses = self.SERVER_ERRORS if statuses is None else frozenset(statuses)
+        self.connection_errors = connection_errors
+        self.budget = budget
+
+    def record_attempt(self):
+        """Called once for every request before its first attempt."""
+        if self.budget is not None:
+            self.budget.record_attempt()
+
+    def is_retryable(self, method, headers, status=None, exc=None):
+        if exc is not None:
+            if not (self.connection_errors and getattr(exc, "should_retry", False)):
+                return False
+        elif status != self.RATE_LIMITED and status not in self.statuses:
+            return False
+        return status == self.RATE_LIMITED or self.is_idempotent(method, headers)
+
+    def is_idempotent(self, method, headers):
+        if method.lower() in self.IDEMPOTENT_METHODS:
+            return True
+        return any(k.lower() == "idempotency-key" for k in headers or ())
+
+    def should_retry(self, method, headers, status=None, exc=None):
+        if not self.is_retryable(method, headers, status=status, exc=exc):
+            return False
+        return self.budget is None or self.budget.try_spend()
+
+
+# Used when neither `payjp.retry_policy` nor the client's is set; its budget
+# is shared by the whole process.
+default_policy = RetryPolicy(budget=RetryBudget())
@@ -5,7 +5,7 @@ import re
 import string
 import unittest
 
-from mock import Mock, patch
+from mock import AsyncMock, Mock, patch
 
 import payjp
 
@@ -40,6 +40,8 @@ class PayjpTestCase(unittest.TestCase):
         "max_retry",
         "retry_initial_delay",
         "retry_max_delay",
+        "retry_policy",
+        "timeout",
     )
 
     def setUp(self):
@@ -119,6 +121,23 @@ class PayjpApiTestCase(PayjpTestCase):
         self.requestor_mock.request = Mock(return_value=(res, "reskey"))
 
 
+class PayjpAsyncApiTestCase(PayjpTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        super(PayjpAsyncApiTestCase, self).setUp()
+
+        self.requestor_patcher = patch("payjp.api_requestor.AsyncAPIRequestor")
+        self.requestor_class_mock = self.requestor_patcher.start()
+        self.requestor_mock = self.requestor_class_mock.return_value
+
+    def tearDown(self):
+        super(PayjpAsyncApiTestCase, self).tearDown()
+
+        self.requestor_patcher.stop()
+
+    def mock_response(self, res):
+        self.requestor_mock.request = AsyncMock(return_value=(res, "reskey"))
+
+
 class MyResource(payjp.resource.APIResource):
     pass
 
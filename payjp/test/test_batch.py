@@ -0,0 +1,113 @@
+# coding: utf-8
+
+import asyncio
+import functools
+import itertools
+import threading
+import time
+import unittest
+
+import payjp
+from payjp import error
+from payjp.batch import BatchExecutor
+
+
+class FakeAPI(object):
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def refund(self, i):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Later items finish first.
+            time.sleep(self.delay * (i % 3))
+            if i % 4 == 3:
+                raise error.InvalidRequestError("No such charge", "id")
+            return "re_%d" % i
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def arefund(self, i):
+        await asyncio.sleep(self.delay * (i % 3))
+        if i % 4 == 3:
+            raise error.CardError("Declined", None, "card_declined")
+        return "re_%d" % i
+
+
+class BatchExecutorTest(unittest.TestCase):
+    def test_results_in_order(self):
+        api = FakeAPI(delay=0.002)
+        operations = (functools.partial(api.refund, i) for i in range(20))
+
+        results = list(BatchExecutor(workers=4).run(operations))
+
+        self.assertEqual(list(range(20)), [r.index for r in results])
+        for r in results:
+            if r.index % 4 == 3:
+                self.assertFalse(r.ok)
+                self.assertTrue(isinstance(r.error, error.InvalidRequestError))
+            else:
+                self.assertEqual("re_%d" % r.index, r.result)
+        self.assertTrue(1 < api.max_in_flight <= 4)
+
+    def test_bounded_read_ahead(self):
+        consumed = []
+
+        def operations():
+            for i in itertools.count():
+                consumed.append(i)
+                yield functools.partial(lambda i: i, i)
+
+        results = BatchExecutor(workers=2, window=5).run(operations())
+        for result in results:
+            if result.index == 10:
+                break
+        results.close()
+
+        self.assertTrue(len(consumed) <= 16)
+
+    def test_progress(self):
+        api = FakeAPI()
+        seen = []
+
+        list(
+            payjp.batch.run(
+                (functools.partial(api.refund, i) for i in range(8)),
+                workers=2,
+                progress=lambda p: seen.append((p.completed, p.failed)),
+            )
+        )
+
+        self.assertEqual(8, len(seen))
+        self.assertEqual((8, 2), seen[-1])
+
+    def test_other_errors_stop_the_batch(self):
+        def boom():
+            raise KeyError("boom")
+
+        results = BatchExecutor(workers=2).run([lambda: 1, boom, lambda: 3])
+
+        self.assertEqual(1, next(results).result)
+        self.assertRaises(KeyError, next, results)
+
+
+class AsyncBatchExecutorTest(unittest.IsolatedAsyncioTestCase):
+    async def test_results_in_order(self):
+        api = FakeAPI(delay=0.002)
+        operations = (functools.partial(api.arefund, i) for i in range(10))
+
+        results = [r async for r in BatchExecutor(workers=3).arun(operations)]
+
+        self.assertEqual(list(range(10)), [r.index for r in results])
+        self.assertEqual(["re_0", "re_1", "re_2"], [r.result for r in results[:3]])
+        self.assertTrue(isinstance(results[3].error, error.CardError))
+
+
+if __name__ == "__main__":
+    unittest.main()
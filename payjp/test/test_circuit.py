@@ -0,0 +1,141 @@
+# coding: utf-8
+
+import unittest
+
+from mock import Mock
+
+import payjp
+from payjp.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from payjp.error import APIConnectionError, CircuitOpenError
+from payjp.test.helper import PayjpUnitTestCase
+
+API_BASE = "https://api.pay.jp"
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            failure_rate=0.5,
+            min_calls=4,
+            window=10,
+            open_duration=5,
+            clock=self.clock,
+        )
+
+    def call(self, path="/v1/charges", status=200, elapsed=0.1, exc=None):
+        token, _ = self.breaker.acquire(API_BASE, path)
+        return self.breaker.release(token, status=status, elapsed=elapsed, exc=exc)
+
+    def test_opens_on_failure_rate(self):
+        self.call(status=200)
+        self.call(status=503)
+        self.call(status=200)
+        self.assertEqual(CLOSED, self.breaker.state(API_BASE, "charges"))
+
+        transition = self.call(exc=APIConnectionError("reset", should_retry=True))
+
+        self.assertEqual(((API_BASE, "charges"), CLOSED, OPEN), transition)
+        self.assertRaises(
+            CircuitOpenError, self.breaker.acquire, API_BASE, "/v1/charges/ch_1"
+        )
+        # Other families are unaffected.
+        self.call(path="/v1/tokens")
+
+    def test_ignores_client_errors(self):
+        for _ in range(4):
+            self.call(status=404)
+            self.call(exc=APIConnectionError("bad config"))
+
+        self.assertEqual(CLOSED, self.breaker.state(API_BASE, "charges"))
+
+    def test_window_expires(self):
+        for _ in range(3):
+            self.call(status=500)
+        self.clock.now += 11
+        self.call(status=500)
+
+        self.assertEqual(CLOSED, self.breaker.state(API_BASE, "charges"))
+
+    def test_half_open_probe(self):
+        for _ in range(4):
+            self.call(status=500)
+        self.clock.now += 5
+        self.assertEqual(HALF_OPEN, self.breaker.state(API_BASE, "charges"))
+
+        token, transition = self.breaker.acquire(API_BASE, "/v1/charges")
+        self.assertEqual(((API_BASE, "charges"), OPEN, HALF_OPEN), transition)
+        # Only one probe at a time.
+        self.assertRaises(
+            CircuitOpenError, self.breaker.acquire, API_BASE, "/v1/charges"
+        )
+
+        self.breaker.release(token, status=500)
+        self.assertEqual(OPEN, self.breaker.state(API_BASE, "charges"))
+
+        self.clock.now += 5
+        transition = self.call(status=200)
+        self.assertEqual(((API_BASE, "charges"), HALF_OPEN, CLOSED), transition)
+
+    def test_slow_calls(self):
+        breaker = CircuitBreaker(
+            slow_call=1.0, slow_call_rate=0.5, min_calls=2, clock=self.clock
+        )
+        for _ in range(2):
+            token, _ = breaker.acquire(API_BASE, "/v1/events")
+            breaker.release(token, status=200, elapsed=3.0)
+
+        self.assertEqual(OPEN, breaker.state(API_BASE, "events"))
+
+
+class RequestorCircuitTest(PayjpUnitTestCase):
+    def setUp(self):
+        super(RequestorCircuitTest, self).setUp()
+        self.http_client = Mock(payjp.http_client.HTTPClient)
+        self.http_client.name = "mockclient"
+        self.http_client.request = Mock(
+            return_value=('{"error": {"message": "down"}}', 503)
+        )
+        self.events = []
+        self.client = payjp.Client(
+            api_key="sk_test",
+            http_client=self.http_client,
+            circuit_breaker=CircuitBreaker(min_calls=2),
+        )
+        self.client.instrumentation.subscribe(
+            lambda event, payload: self.events.append((event, payload))
+        )
+
+    def test_rejects_while_open(self):
+        for _ in range(2):
+            with self.assertRaises(payjp.error.APIError):
+                self.client.charges.retrieve("ch_1")
+
+        with self.assertRaises(CircuitOpenError):
+            self.client.charges.retrieve("ch_1")
+
+        self.assertEqual(2, self.http_client.request.call_count)
+        circuit_events = [p for e, p in self.events if e == "circuit"]
+        self.assertEqual(
+            [
+                {
+                    "api_base": "https://api.pay.jp",
+                    "family": "charges",
+                    "previous": CLOSED,
+                    "state": OPEN,
+                }
+            ],
+            circuit_events,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
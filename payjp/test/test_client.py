@@ -0,0 +1,178 @@
+# coding: utf-8
+
+import pickle
+import unittest
+
+from mock import Mock, patch
+
+import payjp
+from payjp.test.helper import PayjpUnitTestCase
+from payjp.test.test_requestor import APIHeaderMatcher
+
+
+class ClientTest(PayjpUnitTestCase):
+    def setUp(self):
+        super(ClientTest, self).setUp()
+
+        self.http_client = Mock(payjp.http_client.HTTPClient)
+        self.http_client.name = "mockclient"
+        self.client = payjp.Client(
+            api_key="sk_client", account="acct_client", http_client=self.http_client
+        )
+
+    def mock_response(self, *responses):
+        self.http_client.request = Mock(side_effect=list(responses))
+
+    def test_create_uses_client_config(self):
+        payjp.api_key = "sk_global"
+        payjp.api_version = "global_version"
+        self.mock_response(('{"object": "charge", "id": "ch_foo"}', 200))
+
+        charge = self.client.charges.create(amount=100, currency="jpy")
+
+        self.http_client.request.assert_called_with(
+            "post",
+            "https://api.pay.jp/v1/charges",
+            APIHeaderMatcher(
+                "sk_client",
+                extra={"Payjp-Account": "acct_client"},
+                request_method="post",
+            ),
+            "amount=100&currency=jpy",
+        )
+        self.assertTrue(isinstance(charge, payjp.Charge))
+        self.assertTrue(charge.payjp_client is self.client)
+
+    def test_returned_objects_keep_client(self):
+        self.mock_response(
+            ('{"object": "charge", "id": "ch_foo"}', 200),
+            ('{"object": "charge", "id": "ch_foo", "refunded": true}', 200),
+        )
+
+        charge = self.client.charges.retrieve("ch_foo")
+        charge.refund(amount=50)
+
+        self.http_client.request.assert_called_with(
+            "post",
+            "https://api.pay.jp/v1/charges/ch_foo/refund",
+            APIHeaderMatcher(
+                "sk_client",
+                extra={"Payjp-Account": "acct_client"},
+                request_method="post",
+            ),
+            "amount=50",
+        )
+        self.assertEqual(True, charge.refunded)
+
+    def test_list_items_keep_client(self):
+        self.mock_response(
+            ('{"object": "list", "data": [{"object": "customer", "id": "c"}]}', 200)
+        )
+
+        customers = self.client.customers.all(limit=1)
+
+        self.assertTrue(customers.data[0].payjp_client is self.client)
+
+    def test_clients_are_independent(self):
+        other_http_client = Mock(payjp.http_client.HTTPClient)
+        other_http_client.name = "mockclient"
+        other_http_client.request = Mock(return_value=('{"id": "acct"}', 200))
+        other = payjp.Client(
+            api_key="sk_other",
+            api_base="https://other.example",
+            http_client=other_http_client,
+        )
+        self.mock_response(('{"id": "acct"}', 200))
+
+        self.client.accounts.retrieve()
+        other.accounts.retrieve()
+
+        self.http_client.request.assert_called_with(
+            "get",
+            "https://api.pay.jp/v1/accounts",
+            APIHeaderMatcher(
+                "sk_client",
+                extra={"Payjp-Account": "acct_client"},
+                request_method="get",
+            ),
+            None,
+        )
+        other_http_client.request.assert_called_with(
+            "get",
+            "https://other.example/v1/accounts",
+            APIHeaderMatcher("sk_other", request_method="get"),
+            None,
+        )
+
+    def test_retry_settings(self):
+        payjp.max_retry = 0
+        client = payjp.Client(
+            api_key="sk_client",
+            retry=1,
+            retry_initial_delay=0.1,
+            http_client=self.http_client,
+        )
+        self.mock_response(('{"error": {}}', 429), ('{"id": "ch_foo"}', 200))
+
+        with patch("payjp.api_requestor.time.sleep") as sleep:
+            charge = client.charges.retrieve("ch_foo")
+
+        self.assertEqual("ch_foo", charge.id)
+        self.assertEqual(1, sleep.call_count)
+        self.assertTrue(sleep.call_args[0][0] <= 0.1)
+
+    def test_instrumentation(self):
+        events = []
+        self.client.instrumentation.subscribe(
+            lambda event, payload: events.append((event, payload))
+        )
+        self.mock_response(('{"id": "ch_foo"}', 200))
+
+        self.client.charges.retrieve("ch_foo")
+
+        self.assertEqual(1, len(events))
+        event, payload = events[0]
+        self.assertEqual("request", event)
+        self.assertEqual("get", payload["method"])
+        self.assertEqual("https://api.pay.jp/v1/charges/ch_foo", payload["url"])
+        self.assertEqual("acct_client", payload["account"])
+        self.assertEqual(200, payload["status"])
+        self.assertTrue(payload["elapsed"] >= 0)
+
+    def test_service_passthrough(self):
+        self.assertEqual("/v1/charges", self.client.charges.class_url())
+        self.assertTrue(self.client.charges.construct_from is not None)
+
+    def test_pickle_drops_client(self):
+        self.mock_response(('{"object": "charge", "id": "ch_foo"}', 200))
+
+        charge = self.client.charges.retrieve("ch_foo")
+        restored = pickle.loads(pickle.dumps(charge))
+
+        self.assertEqual("ch_foo", restored.id)
+        self.assertEqual(None, restored.payjp_client)
+        self.assertRaises(KeyError, restored.__getitem__, "payjp_client")
+
+
+class InstrumentationTest(unittest.TestCase):
+    def test_failing_callback_is_isolated(self):
+        instrumentation = payjp.hooks.Instrumentation()
+        seen = []
+
+        def broken(event, payload):
+            raise RuntimeError("boom")
+
+        instrumentation.subscribe(broken)
+        instrumentation.subscribe(lambda event, payload: seen.append(event))
+
+        with patch("payjp.hooks.logger"):
+            instrumentation.emit("request", {})
+
+        self.assertEqual(["request"], seen)
+
+        instrumentation.unsubscribe(broken)
+        self.assertEqual(1, len(instrumentation._subscribers))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+# coding: utf-8
+
+import asyncio
+import threading
+import time
+import unittest
+
+from mock import Mock
+
+import payjp
+from payjp.concurrency import AdaptiveLimiter, ConcurrencyLimiter
+from payjp.test.helper import PayjpUnitTestCase
+
+
+class ConcurrencyLimiterTest(unittest.TestCase):
+    def test_caps_threads(self):
+        limiter = ConcurrencyLimiter(2)
+        lock = threading.Lock()
+        state = {"in_flight": 0, "max": 0}
+
+        def work():
+            token = limiter.acquire()
+            with lock:
+                state["in_flight"] += 1
+                state["max"] = max(state["max"], state["in_flight"])
+            time.sleep(0.01)
+            with lock:
+                state["in_flight"] -= 1
+            limiter.release(token, status=200, elapsed=0.01)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2, state["max"])
+        self.assertEqual(0, limiter.in_flight)
+
+    def test_invalid_limit(self):
+        self.assertRaises(ValueError, ConcurrencyLimiter, 0)
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def complete(self, limiter, count, status=200, elapsed=0.1):
+        tokens = [limiter.acquire() for _ in range(count)]
+        for token in tokens:
+            limiter.release(token, status=status, elapsed=elapsed)
+
+    def test_additive_increase(self):
+        limiter = AdaptiveLimiter(initial=2, max_concurrency=4)
+
+        # About one more slot per round of `limit` responses.
+        for _ in range(3):
+            self.complete(limiter, limiter.limit)
+        self.assertEqual(3, limiter.limit)
+        for _ in range(3):
+            self.complete(limiter, limiter.limit)
+        self.assertEqual(4, limiter.limit)
+
+    def test_multiplicative_decrease_once_per_burst(self):
+        limiter = AdaptiveLimiter(initial=8, min_concurrency=2)
+
+        self.complete(limiter, 8, status=429)
+        self.assertEqual(4, limiter.limit)
+        self.assertEqual(1, limiter.decreases)
+
+        self.complete(limiter, 4, status=429)
+        self.assertEqual(2, limiter.limit)
+        self.complete(limiter, 2, status=429)
+        self.assertEqual(2, limiter.limit)
+
+    def test_latency_spike(self):
+        limiter = AdaptiveLimiter(initial=4, latency_tolerance=2.0)
+        self.complete(limiter, 1, elapsed=0.1)
+
+        self.complete(limiter, 1, elapsed=0.15)
+        self.assertEqual(4, limiter.limit)
+        self.complete(limiter, 1, elapsed=1.0)
+        self.assertEqual(2, limiter.limit)
+
+    def test_ignores_server_errors(self):
+        limiter = AdaptiveLimiter(initial=4)
+
+        self.complete(limiter, 4, status=503)
+        self.complete(limiter, 4, status=None, elapsed=None)
+
+        self.assertEqual(4, limiter.limit)
+        self.assertEqual(0, limiter.increases + limiter.decreases)
+
+    def test_caps_in_flight_at_limit(self):
+        limiter = AdaptiveLimiter(initial=2)
+        limiter.acquire()
+        limiter.acquire()
+
+        self.assertFalse(limiter._has_capacity())
+
+    def test_invalid_bounds(self):
+        self.assertRaises(ValueError, AdaptiveLimiter, initial=0)
+        self.assertRaises(ValueError, AdaptiveLimiter, initial=8, max_concurrency=4)
+        self.assertRaises(ValueError, AdaptiveLimiter, decrease=1)
+
+
+class AsyncConcurrencyLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_caps_tasks(self):
+        limiter = ConcurrencyLimiter(3)
+        state = {"in_flight": 0, "max": 0}
+
+        async def work():
+            token = await limiter.aacquire()
+            state["in_flight"] += 1
+            state["max"] = max(state["max"], state["in_flight"])
+            await asyncio.sleep(0.005)
+            state["in_flight"] -= 1
+            limiter.release(token)
+
+        await asyncio.gather(*[work() for _ in range(10)])
+
+        self.assertEqual(3, state["max"])
+        self.assertEqual(0, limiter.in_flight)
+
+    async def test_cancelled_waiter(self):
+        limiter = ConcurrencyLimiter(1)
+        token = await limiter.aacquire()
+
+        waiter = asyncio.ensure_future(limiter.aacquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        limiter.release(token)
+        self.assertEqual(0, limiter.in_flight)
+        await asyncio.wait_for(limiter.aacquire(), 1)
+
+
+class RequestorConcurrencyTest(PayjpUnitTestCase):
+    def setUp(self):
+        super(RequestorConcurrencyTest, self).setUp()
+        self.http_client = Mock(payjp.http_client.HTTPClient)
+        self.http_client.name = "mockclient"
+        self.limiter = Mock(ConcurrencyLimiter)
+        self.limiter.acquire.return_value = "token"
+        self.client = payjp.Client(
+            api_key="sk_test",
+            http_client=self.http_client,
+            concurrency_limiter=self.limiter,
+        )
+
+    def test_acquires_around_request(self):
+        self.http_client.request = Mock(return_value=('{"id": "ch"}', 200))
+
+        self.client.charges.retrieve("ch")
+
+        self.limiter.acquire.assert_called_once_with()
+        self.limiter.release.assert_called_once()
+        args, kwargs = self.limiter.release.call_args
+        self.assertEqual(("token",), args)
+        self.assertEqual(200, kwargs["status"])
+
+    def test_releases_on_error(self):
+        self.http_client.request = Mock(
+            side_effect=payjp.error.APIConnectionError("boom")
+        )
+
+        with self.assertRaises(payjp.error.APIConnectionError):
+            self.client.charges.retrieve("ch")
+
+        args, kwargs = self.limiter.release.call_args
+        self.assertEqual(None, kwargs["status"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+# coding: utf-8
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mock import patch
+
+import payjp
+from payjp.export import TimeWindowExporter
+from payjp.test.helper import PayjpTestCase
+
+
+class FakeCharges(object):
+    def __init__(self, created_times):
+        # Newest first, like the API.
+        self.objects = sorted(
+            (
+                {"object": "charge", "id": "ch_%d" % i, "created": created}
+                for i, created in enumerate(created_times)
+            ),
+            key=lambda o: (-o["created"], o["id"]),
+        )
+        self.probes = []
+        self._lock = threading.Lock()
+
+    def all(self, limit=10, offset=0, since=None, until=None, **kwargs):
+        matching = [
+            o
+            for o in self.objects
+            if (since is None or o["created"] >= since)
+            and (until is None or o["created"] <= until)
+        ]
+        if limit == 1:
+            with self._lock:
+                self.probes.append((since, until))
+        page = {
+            "object": "list",
+            "count": len(matching),
+            "has_more": offset + limit < len(matching),
+            "data": matching[offset : offset + limit],
+        }
+        return payjp.resource.convert_to_payjp_object(page, "key", None)
+
+
+class TimeWindowExporterTest(PayjpTestCase):
+    def setUp(self):
+        super(TimeWindowExporterTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        # 40 charges in [1000, 1100), denser at the end of the range.
+        self.fake = FakeCharges(
+            [1000 + i * 5 for i in range(10)] + [1090 + i % 10 for i in range(30)]
+        )
+        self.patcher = patch(
+            "payjp.resource.ListableAPIResource.all", side_effect=self.fake.all
+        )
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.tmpdir)
+        super(TimeWindowExporterTest, self).tearDown()
+
+    def expected_ids(self, since=1000, until=1100):
+        return [o["id"] for o in self.fake.objects if since <= o["created"] < until]
+
+    def test_splits_dense_windows(self):
+        exporter = TimeWindowExporter(
+            payjp.Charge, since=1000, until=1100, max_window_size=8
+        )
+
+        windows = list(exporter.windows())
+
+        self.assertTrue(
+            all(count <= 8 or until - since == 1 for since, until, count in windows)
+        )
+        self.assertEqual(40, sum(count for _, _, count in windows))
+        # Newest first and non-overlapping.
+        for (since, _, _), (_, until, _) in zip(windows, windows[1:]):
+            self.assertTrue(until <= since)
+
+    def test_exports_in_order(self):
+        exporter = TimeWindowExporter(
+            payjp.Charge, since=1000, until=1100, max_window_size=8, page_size=3
+        )
+
+        ids = [charge.id for charge in exporter]
+
+        self.assertEqual(self.expected_ids(), ids)
+        self.assertTrue(all(until < 1100 for _, until in self.fake.probes))
+
+    def test_resumes_from_checkpoint(self):
+        checkpoint = os.path.join(self.tmpdir, "export.json")
+        exporter = TimeWindowExporter(
+            payjp.Charge,
+            since=1000,
+            until=1100,
+            max_window_size=8,
+            workers=2,
+            checkpoint=checkpoint,
+        )
+
+        iterator = iter(exporter)
+        consumed = [next(iterator).id for _ in range(25)]
+        iterator.close()
+
+        with open(checkpoint) as f:
+            completed_since = json.load(f)["completed_since"]
+        self.assertTrue(1000 < completed_since < 1100)
+
+        resumed = [charge.id for charge in exporter]
+
+        self.assertEqual(self.expected_ids(1000, completed_since), resumed)
+        self.assertEqual(self.expected_ids(), consumed[: 40 - len(resumed)] + resumed)
+
+        # A finished export yields nothing more.
+        self.assertEqual([], list(exporter))
+
+    def test_rejects_foreign_checkpoint(self):
+        checkpoint = os.path.join(self.tmpdir, "export.json")
+        list(TimeWindowExporter(payjp.Charge, 1000, 1100, checkpoint=checkpoint))
+
+        exporter = TimeWindowExporter(payjp.Charge, 1000, 1200, checkpoint=checkpoint)
+
+        self.assertRaises(ValueError, list, exporter)
+
+
+if __name__ == "__main__":
+    unittest.main()
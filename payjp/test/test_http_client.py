@@ -1,5 +1,6 @@
 # coding: utf-8
 
+import datetime
 import unittest
 import warnings
 
@@ -70,7 +71,7 @@ class ClientTestBase:
 
             headers = {"my-header": "header val"}
 
-            body, code = self.make_request(meth, abs_url, headers, data)
+            body, code = self.make_request(meth, abs_url, headers, data)[:2]
 
             self.assertEqual(200, code)
             self.assertEqual('{"foo": "baz"}', body)
@@ -96,18 +97,109 @@ class RequestsClientTests(PayjpUnitTestCase, ClientTestBase):
         result = Mock()
         result.content = body
         result.status_code = code
+        result.headers = {"Payjp-Request-Id": "req_123"}
+        result.elapsed = datetime.timedelta(milliseconds=12)
 
-        mock.request = Mock(return_value=result)
+        mock.Session.return_value.request = Mock(return_value=result)
 
     def mock_error(self, mock):
         mock.exceptions.RequestException = Exception
-        mock.request.side_effect = mock.exceptions.RequestException()
+        mock.Session.return_value.request.side_effect = (
+            mock.exceptions.RequestException()
+        )
 
     def check_call(self, mock, meth, url, post_data, headers):
-        mock.request.assert_called_with(
+        mock.Session.return_value.request.assert_called_with(
             meth, url, headers=headers, data=post_data, timeout=80
         )
 
+    def test_response_metadata(self):
+        self.mock_response(self.request_mock, '{"foo": "baz"}', 200)
+
+        _, _, headers, timing = self.make_request("get", self.valid_url, {}, None)
+
+        self.assertEqual({"payjp-request-id": "req_123"}, headers)
+        self.assertEqual(0.012, timing["first_byte"])
+        self.assertTrue(timing["total"] >= 0)
+        self.assertEqual(None, timing["connect"])
+
+    def test_session_is_reused(self):
+        self.mock_response(self.request_mock, '{"foo": "baz"}', 200)
+
+        client = self.request_client()
+        client.request("get", self.valid_url, {}, None)
+        client.request("get", self.valid_url, {}, None)
+
+        self.assertEqual(1, self.request_mock.Session.call_count)
+        self.assertEqual(2, self.request_mock.Session.return_value.request.call_count)
+
+    def test_pool_configuration(self):
+        self.mock_response(self.request_mock, '{"foo": "baz"}', 200)
+
+        client = self.request_client(
+            pool_connections=2, pool_maxsize=32, pool_block=True
+        )
+        client.request("get", self.valid_url, {}, None)
+
+        self.request_mock.adapters.HTTPAdapter.assert_called_with(
+            pool_connections=2, pool_maxsize=32, pool_block=True
+        )
+        adapter = self.request_mock.adapters.HTTPAdapter.return_value
+        self.request_mock.Session.return_value.mount.assert_any_call(
+            "https://", adapter
+        )
+
+    def test_keep_alive_disabled(self):
+        self.mock_response(self.request_mock, '{"foo": "baz"}', 200)
+
+        client = self.request_client(keep_alive=False)
+        client.request("get", self.valid_url, {"my-header": "val"}, None)
+
+        self.check_call(
+            self.request_mock,
+            "get",
+            self.valid_url,
+            None,
+            {"my-header": "val", "Connection": "close"},
+        )
+
+    def test_close(self):
+        self.mock_response(self.request_mock, '{"foo": "baz"}', 200)
+
+        client = self.request_client()
+        client.request("get", self.valid_url, {}, None)
+        client.close()
+
+        self.request_mock.Session.return_value.close.assert_called_once_with()
+
+        client.request("get", self.valid_url, {}, None)
+        self.assertEqual(2, self.request_mock.Session.call_count)
+
+
+class ThreadedAsyncClientTests(unittest.IsolatedAsyncioTestCase):
+    async def test_request(self):
+        sync_client = Mock(payjp.http_client.HTTPClient)
+        sync_client.name = "mockclient"
+        sync_client.request = Mock(return_value=('{"foo": "baz"}', 200))
+
+        client = payjp.http_client.ThreadedAsyncClient(sync_client)
+        body, code = await client.request("get", "https://api.pay.jp/foo", {}, None)
+
+        self.assertEqual("mockclient", client.name)
+        self.assertEqual(('{"foo": "baz"}', 200), (body, code))
+        sync_client.request.assert_called_with(
+            "get", "https://api.pay.jp/foo", {}, None
+        )
+
+    def test_default_async_client(self):
+        client = payjp.http_client.new_default_async_http_client()
+        if payjp.http_client.httpx is None:
+            expected = payjp.http_client.ThreadedAsyncClient
+        else:
+            expected = payjp.http_client.HTTPXClient
+
+        self.assertTrue(isinstance(client, expected))
+
 
 if __name__ == "__main__":
     unittest.main()
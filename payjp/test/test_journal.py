@@ -0,0 +1,101 @@
+# coding: utf-8
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+
+from payjp import error
+from payjp.journal import FAILED, STARTED, SUCCEEDED, Journal
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "job.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def refund(self, charge_id, headers):
+        self.calls.append((charge_id, headers["Idempotency-Key"]))
+        if charge_id == "ch_declined":
+            raise error.CardError("Declined", None, "card_declined")
+        if charge_id == "ch_timeout":
+            raise error.APIConnectionError("timed out")
+        return {"id": charge_id, "refunded": True}
+
+    def test_deterministic_idempotency_keys(self):
+        with Journal(self.path, job="refunds") as journal:
+            key = journal.idempotency_key("ch_1")
+            self.assertEqual(key, journal.idempotency_key("ch_1"))
+            self.assertNotEqual(key, journal.idempotency_key("ch_2"))
+        with Journal(self.path, job="other") as journal:
+            self.assertNotEqual(key, journal.idempotency_key("ch_1"))
+
+    def test_records_outcomes(self):
+        self.calls = []
+        items = ["ch_1", "ch_declined", "ch_timeout", "ch_2"]
+
+        with Journal(self.path, job="refunds") as journal:
+            results = list(journal.run(items, self.refund, workers=2))
+
+            self.assertEqual([True, False, False, True], [r.ok for r in results])
+            self.assertEqual(SUCCEEDED, journal.status("ch_1"))
+            self.assertEqual(FAILED, journal.status("ch_declined"))
+            self.assertEqual(STARTED, journal.status("ch_timeout"))
+            self.assertEqual(["ch_timeout"], journal.in_doubt())
+            self.assertEqual("ch_2", journal.outcome("ch_2")["id"])
+
+        with open(self.path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(7, len(records))
+        self.assertEqual("refund", records[0]["operation"])
+
+    def test_resume_skips_finished_and_replays_in_doubt(self):
+        self.calls = []
+        items = ["ch_1", "ch_declined", "ch_timeout", "ch_2"]
+        with Journal(self.path, job="refunds") as journal:
+            list(journal.run(items, self.refund))
+        first_calls = dict(self.calls)
+
+        self.calls = []
+        with Journal(self.path, job="refunds") as journal:
+            results = list(journal.run(items, self.refund))
+
+            self.assertEqual(3, journal.skipped)
+            self.assertEqual(1, len(results))
+        self.assertEqual([("ch_timeout", first_calls["ch_timeout"])], self.calls)
+
+    def test_ignores_torn_last_line(self):
+        with Journal(self.path, job="refunds") as journal:
+            journal.start("ch_1")
+            journal.succeed("ch_1", {"id": "re_1"})
+        with open(self.path, "a") as f:
+            f.write('{"item": "ch_2", "sta')
+
+        with Journal(self.path, job="refunds") as journal:
+            self.assertEqual(SUCCEEDED, journal.status("ch_1"))
+            self.assertEqual(None, journal.status("ch_2"))
+            journal.start("ch_2")
+
+        with Journal(self.path, job="refunds") as journal:
+            self.assertEqual(STARTED, journal.status("ch_2"))
+
+    def test_batches_fsync(self):
+        journal = Journal(self.path, job="refunds", fsync_every=3, fsync_interval=60)
+        journal._sync = Mock(wraps=journal._sync)
+
+        for i in range(7):
+            journal.start(i)
+
+        self.assertEqual(2, journal._sync.call_count)
+        journal.close()
+        self.assertEqual(3, journal._sync.call_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
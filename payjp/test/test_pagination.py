@@ -0,0 +1,231 @@
+# coding: utf-8
+
+import threading
+import time
+import unittest
+
+from mock import AsyncMock, Mock, patch
+
+import payjp
+from payjp.test.helper import PayjpApiTestCase, PayjpAsyncApiTestCase
+
+
+def make_page(ids, has_more, created=1000):
+    return {
+        "object": "list",
+        "url": "/v1/charges",
+        "has_more": has_more,
+        "count": len(ids),
+        "data": [
+            {"object": "charge", "id": id, "created": created - i}
+            for i, id in enumerate(ids)
+        ],
+    }
+
+
+class ListIteratorTest(PayjpApiTestCase):
+    def mock_pages(self, *pages):
+        self.requestor_mock.request = Mock(
+            side_effect=[(page, "reskey") for page in pages]
+        )
+
+    def test_iterates_across_pages(self):
+        self.mock_pages(
+            make_page(["ch_1", "ch_2"], True),
+            make_page(["ch_3", "ch_4"], True, created=998),
+            make_page(["ch_5"], False, created=996),
+        )
+
+        charges = list(payjp.Charge.iterate(limit=2, customer="cus_foo"))
+
+        self.assertEqual(
+            ["ch_1", "ch_2", "ch_3", "ch_4", "ch_5"], [c.id for c in charges]
+        )
+        self.assertTrue(all(isinstance(c, payjp.Charge) for c in charges))
+        calls = self.requestor_mock.request.call_args_list
+        self.assertEqual(
+            ("get", "/v1/charges", {"limit": 2, "offset": 0, "customer": "cus_foo"}),
+            calls[0][0],
+        )
+        self.assertEqual(
+            (
+                "get",
+                "/v1/charges",
+                {"limit": 2, "offset": 2, "customer": "cus_foo", "until": 1000},
+            ),
+            calls[1][0],
+        )
+        self.assertEqual(4, calls[2][0][2]["offset"])
+
+    def test_is_lazy(self):
+        self.mock_pages(make_page(["ch_1", "ch_2"], True))
+
+        iterator = iter(payjp.Charge.iterate(limit=2))
+        self.assertFalse(self.requestor_mock.request.called)
+
+        next(iterator)
+        self.assertEqual(1, self.requestor_mock.request.call_count)
+
+    def test_default_page_size_and_filters(self):
+        self.mock_pages(make_page([], False))
+
+        self.assertEqual([], list(payjp.Event.iterate(since=10, until=20)))
+
+        self.requestor_mock.request.assert_called_with(
+            "get",
+            "/v1/events",
+            {"limit": 100, "offset": 0, "since": 10, "until": 20},
+        )
+
+    def test_resume_with_cursor(self):
+        self.mock_pages(make_page(["ch_1", "ch_2"], True))
+
+        iterator = payjp.Charge.iterate(limit=2)
+        first = next(iter(iterator))
+        cursor = iterator.cursor
+
+        self.assertEqual("ch_1", first.id)
+        self.assertEqual({"limit": 2, "offset": 1, "until": 1000}, cursor)
+
+        self.mock_pages(make_page(["ch_2"], False, created=999))
+        resumed = list(payjp.Charge.iterate(cursor=cursor))
+
+        self.assertEqual(["ch_2"], [c.id for c in resumed])
+        self.requestor_mock.request.assert_called_with(
+            "get", "/v1/charges", {"limit": 2, "offset": 1, "until": 1000}
+        )
+
+    def test_auto_paging_iter(self):
+        first = payjp.resource.convert_to_payjp_object(
+            make_page(["ch_1", "ch_2"], True), "mykey", None
+        )
+        self.mock_pages(make_page(["ch_3"], False, created=998))
+
+        charges = list(first.auto_paging_iter())
+
+        self.assertEqual(["ch_1", "ch_2", "ch_3"], [c.id for c in charges])
+        self.requestor_mock.request.assert_called_once_with(
+            "get", "/v1/charges", {"limit": 2, "offset": 2, "until": 1000}, None
+        )
+
+
+class AsyncListIteratorTest(PayjpAsyncApiTestCase):
+    async def test_async_iteration(self):
+        self.requestor_mock.request = AsyncMock(
+            side_effect=[
+                (make_page(["ch_1"], True), "reskey"),
+                (make_page(["ch_2"], False, created=999), "reskey"),
+            ]
+        )
+
+        charges = [c async for c in payjp.Charge.iterate(limit=1)]
+
+        self.assertEqual(["ch_1", "ch_2"], [c.id for c in charges])
+        self.assertEqual(2, self.requestor_mock.request.await_count)
+
+
+class FakeListEndpoint(object):
+    def __init__(self, total, announced_count=None, delay=0):
+        self.total = total
+        self.announced_count = total if announced_count is None else announced_count
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _page(self, params):
+        offset, limit = params["offset"], params["limit"]
+        ids = list(range(offset, min(offset + limit, self.total)))
+        return {
+            "object": "list",
+            "count": self.announced_count,
+            "has_more": offset + limit < self.total,
+            "data": [{"id": i, "created": 10000 - i} for i in ids],
+        }
+
+    def fetch(self, params):
+        with self._lock:
+            self.calls.append(params)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            return self._page(params)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def afetch(self, params):
+        self.calls.append(params)
+        return self._page(params)
+
+
+class ParallelListIteratorTest(unittest.TestCase):
+    def test_yields_in_order(self):
+        endpoint = FakeListEndpoint(95, delay=0.01)
+
+        iterator = payjp.pagination.ParallelListIterator(
+            endpoint.fetch, {"limit": 10}, workers=4
+        )
+        ids = [item["id"] for item in iterator]
+
+        self.assertEqual(list(range(95)), ids)
+        self.assertEqual(10, len(endpoint.calls))
+        self.assertTrue(1 < endpoint.max_in_flight <= 4)
+        self.assertEqual(
+            list(range(0, 100, 10)), sorted(c["offset"] for c in endpoint.calls)
+        )
+        self.assertTrue(all(c["until"] == 10000 for c in endpoint.calls[1:]))
+        self.assertEqual(95, iterator.cursor["offset"])
+
+    def test_continues_when_count_is_short(self):
+        endpoint = FakeListEndpoint(25, announced_count=10)
+
+        iterator = payjp.pagination.ParallelListIterator(
+            endpoint.fetch, {"limit": 10}, workers=4
+        )
+
+        self.assertEqual(list(range(25)), [item["id"] for item in iterator])
+
+    def test_stops_early(self):
+        endpoint = FakeListEndpoint(1000)
+
+        iterator = iter(
+            payjp.pagination.ParallelListIterator(
+                endpoint.fetch, {"limit": 10}, workers=2
+            )
+        )
+        self.assertEqual(0, next(iterator)["id"])
+        iterator.close()
+
+        self.assertTrue(len(endpoint.calls) <= 3)
+
+    def test_iterate_with_workers(self):
+        with patch("payjp.resource.ListableAPIResource.all") as all_mock:
+            endpoint = FakeListEndpoint(30)
+            all_mock.side_effect = lambda **params: endpoint.fetch(
+                {"offset": params["offset"], "limit": params["limit"]}
+            )
+
+            iterator = payjp.Charge.iterate(limit=10, workers=3)
+
+            self.assertTrue(isinstance(iterator, payjp.pagination.ParallelListIterator))
+            self.assertEqual(30, len(list(iterator)))
+
+
+class AsyncParallelListIteratorTest(unittest.IsolatedAsyncioTestCase):
+    async def test_yields_in_order(self):
+        endpoint = FakeListEndpoint(45)
+
+        iterator = payjp.pagination.ParallelListIterator(
+            endpoint.fetch, {"limit": 10}, afetch_page=endpoint.afetch, workers=3
+        )
+        ids = [item["id"] async for item in iterator]
+
+        self.assertEqual(list(range(45)), ids)
+        self.assertEqual(5, len(endpoint.calls))
+
+
+if __name__ == "__main__":
+    unittest.main()
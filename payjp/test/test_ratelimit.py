@@ -0,0 +1,117 @@
+# coding: utf-8
+
+import threading
+import unittest
+
+from mock import Mock, patch
+
+import payjp
+from payjp.ratelimit import READ, WRITE, RateLimiter, TokenBucket
+from payjp.test.helper import PayjpUnitTestCase
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, burst=3, clock=clock)
+
+        self.assertEqual([0, 0, 0], [bucket.reserve() for _ in range(3)])
+        self.assertAlmostEqual(0.5, bucket.reserve())
+        self.assertAlmostEqual(1.0, bucket.reserve())
+
+        clock.now += 10
+        self.assertAlmostEqual(3, bucket.tokens)
+
+    def test_max_wait_does_not_take_a_token(self):
+        bucket = TokenBucket(1, clock=FakeClock())
+        bucket.reserve()
+
+        self.assertEqual(None, bucket.reserve(max_wait=0.5))
+        self.assertAlmostEqual(1.0, bucket.reserve(max_wait=1))
+
+    def test_shared_by_threads(self):
+        bucket = TokenBucket(10, burst=5, clock=FakeClock())
+        waits = []
+
+        def work():
+            waits.append(bucket.reserve())
+
+        threads = [threading.Thread(target=work) for _ in range(15)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1.0, round(max(waits), 6))
+        self.assertEqual(5, waits.count(0))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_buckets_per_key_account_and_family(self):
+        limiter = RateLimiter(read_rate=10, write_rate=2, clock=FakeClock())
+
+        self.assertTrue(
+            limiter.bucket("sk_a", None, READ) is limiter.bucket("sk_a", None, READ)
+        )
+        self.assertFalse(
+            limiter.bucket("sk_a", None, READ) is limiter.bucket("sk_b", None, READ)
+        )
+        self.assertFalse(
+            limiter.bucket("sk_a", None, READ) is limiter.bucket("sk_a", "acct_1", READ)
+        )
+        self.assertEqual(2, limiter.bucket("sk_a", None, WRITE).rate)
+
+    def test_sheds_over_max_wait(self):
+        limiter = RateLimiter(write_rate=1, max_wait=0, clock=FakeClock())
+
+        self.assertEqual(0, limiter.reserve("sk", None, "post"))
+        self.assertRaises(
+            payjp.error.RateLimitError, limiter.reserve, "sk", None, "post"
+        )
+        # Reads have their own budget.
+        self.assertEqual(0, limiter.reserve("sk", None, "get"))
+
+    @patch("time.sleep")
+    def test_acquire_sleeps(self, sleep):
+        limiter = RateLimiter(read_rate=4, read_burst=1, clock=FakeClock())
+
+        limiter.acquire("sk", None, "get")
+        limiter.acquire("sk", None, "get")
+
+        sleep.assert_called_once_with(0.25)
+
+
+class RequestorRateLimitTest(PayjpUnitTestCase):
+    def setUp(self):
+        super(RequestorRateLimitTest, self).setUp()
+        self.http_client = Mock(payjp.http_client.HTTPClient)
+        self.http_client.name = "mockclient"
+        self.http_client.request = Mock(return_value=('{"id": "ch"}', 200))
+        self.limiter = RateLimiter(write_rate=1, max_wait=0)
+        self.client = payjp.Client(
+            api_key="sk_test",
+            account="acct_1",
+            http_client=self.http_client,
+            rate_limiter=self.limiter,
+        )
+
+    def test_shed_requests_are_not_sent(self):
+        self.client.charges.create(amount=100, currency="jpy")
+
+        with self.assertRaises(payjp.error.RateLimitError):
+            self.client.charges.create(amount=100, currency="jpy")
+
+        self.assertEqual(1, self.http_client.request.call_count)
+        self.assertEqual(0, self.limiter.bucket("sk_test", "acct_1", WRITE).tokens // 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
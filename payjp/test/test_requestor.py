@@ -5,9 +5,10 @@ import datetime
 import unittest
 from urllib.parse import parse_qsl, urlsplit
 
-from mock import Mock, patch
+from mock import AsyncMock, Mock, patch
 
 import payjp
+from payjp.response import ResponseMetadata
 from payjp.test.helper import PayjpUnitTestCase
 
 VALID_API_METHODS = ("get", "post", "delete")
@@ -282,6 +283,65 @@ class APIRequestorRequestTests(PayjpUnitTestCase):
         self.requestor.request("get", self.valid_path, {}, {"foo": "bar"})
         self.check_call("get", headers=APIHeaderMatcher(extra={"foo": "bar"}))
 
+    def test_caches_client_user_agent(self):
+        payjp.api_requestor._client_user_agent.cache_clear()
+        payjp.api_requestor._base_headers.cache_clear()
+        self.mock_response("{}", 200)
+
+        with patch("payjp.api_requestor.platform.platform") as platform_mock:
+            platform_mock.return_value = "TestOS"
+            self.requestor.request("get", self.valid_path, {})
+            self.requestor.request("post", self.valid_path, {})
+
+        self.assertEqual(1, platform_mock.call_count)
+        headers = self.http_client.request.call_args[0][2]
+        self.assertTrue('"platform": "TestOS"' in headers["X-Payjp-Client-User-Agent"])
+
+    def test_supplied_headers_do_not_leak(self):
+        self.mock_response("{}", 200)
+
+        self.requestor.request("get", self.valid_path, {}, {"foo": "bar"})
+        self.requestor.request("get", self.valid_path, {})
+
+        self.check_call("get", headers=APIHeaderMatcher(request_method="get"))
+
+    def test_response_metadata(self):
+        self.http_client.request = Mock(
+            return_value=(
+                '{"id": "ch_1"}',
+                200,
+                {"payjp-request-id": "req_1"},
+                {"first_byte": 0.01},
+            )
+        )
+
+        response, _ = self.requestor.request("get", self.valid_path, {})
+
+        self.assertEqual({"id": "ch_1"}, response)
+        self.assertEqual("req_1", response.metadata.request_id)
+        self.assertEqual(0, response.metadata.retries)
+        self.assertEqual(0.01, response.metadata.timing["first_byte"])
+        self.assertTrue("total" in response.metadata.timing)
+
+        charge = payjp.resource.convert_to_payjp_object(response, "key", None)
+        self.assertTrue(charge.last_response is response.metadata)
+
+    def test_error_metadata(self):
+        self.http_client.request = Mock(
+            return_value=(
+                '{"error": {"message": "No such charge"}}',
+                404,
+                {"payjp-request-id": "req_2"},
+                {},
+            )
+        )
+
+        with self.assertRaises(payjp.error.InvalidRequestError) as error:
+            self.requestor.request("get", self.valid_path, {})
+
+        self.assertEqual("req_2", error.exception.request_id)
+        self.assertEqual({"payjp-request-id": "req_2"}, error.exception.headers)
+
     def test_uses_instance_key(self):
         key = "fookey"
         requestor = payjp.api_requestor.APIRequestor(key, client=self.http_client)
@@ -400,6 +460,7 @@ class APIRequestorRetryTest(PayjpUnitTestCase):
     def setUp(self):
         super(APIRequestorRetryTest, self).setUp()
         self.return_values = []
+        self.headers = {}
 
         def return_value_generator():
             for status in self.return_values:
@@ -408,6 +469,7 @@ class APIRequestorRetryTest(PayjpUnitTestCase):
                         status=status
                     ),
                     status,
+                    ResponseMetadata("get", "/test", status, self.headers),
                     "sk_live_aaa",
                 )
 
@@ -474,6 +536,103 @@ class APIRequestorRetryTest(PayjpUnitTestCase):
 
             self.assertEqual(error.exception.http_status, 599)
 
+    @patch("time.sleep")
+    def test_retry_after_header(self, sleep):
+        payjp.max_retry = 2
+        payjp.retry_max_delay = 10
+        self.headers = {"retry-after": "3"}
+        self.return_values = [429, 429, 200]
+        with self.request_raw_patch:
+            response, _ = self.requestor.request("get", "/test", {})
+
+        self.assertEqual([((3.0,),), ((3.0,),)], sleep.call_args_list)
+        self.assertEqual(2, response.metadata.retries)
+
+    def test_retry_after_is_capped(self):
+        payjp.retry_max_delay = 5
+        metadata = ResponseMetadata("get", "/test", 429, {"retry-after": "60"})
+
+        self.assertEqual(5, self.requestor._get_retry_delay(0, metadata))
+
+    def test_rate_limit_reset_header(self):
+        metadata = ResponseMetadata("get", "/test", 429, {"x-ratelimit-reset": "2"})
+
+        self.assertEqual(2.0, metadata.retry_after)
+
+
+class APIRequestorDefaultClientTest(PayjpUnitTestCase):
+    def setUp(self):
+        super(APIRequestorDefaultClientTest, self).setUp()
+        self._original_default_http_client = payjp.default_http_client
+        payjp.default_http_client = None
+
+    def tearDown(self):
+        payjp.default_http_client = self._original_default_http_client
+        super(APIRequestorDefaultClientTest, self).tearDown()
+
+    def test_shares_default_client(self):
+        first = payjp.api_requestor.APIRequestor()
+        second = payjp.api_requestor.APIRequestor(key="sk_other", account="acct")
+
+        self.assertTrue(
+            isinstance(payjp.default_http_client, payjp.http_client.RequestsClient)
+        )
+        self.assertTrue(first._client is payjp.default_http_client)
+        self.assertTrue(second._client is payjp.default_http_client)
+
+    def test_explicit_client(self):
+        client = Mock(payjp.http_client.HTTPClient)
+        requestor = payjp.api_requestor.APIRequestor(client=client)
+
+        self.assertTrue(requestor._client is client)
+        self.assertEqual(None, payjp.default_http_client)
+
+
+class AsyncAPIRequestorTest(PayjpUnitTestCase, unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        super(AsyncAPIRequestorTest, self).setUp()
+
+        self.http_client = Mock(payjp.http_client.AsyncHTTPClient)
+        self.http_client.name = "mockclient"
+
+        self.requestor = payjp.api_requestor.AsyncAPIRequestor(client=self.http_client)
+
+    def mock_responses(self, *responses):
+        self.http_client.request = AsyncMock(side_effect=list(responses))
+
+    async def test_request(self):
+        self.mock_responses(('{"foo": "bar"}', 200))
+
+        body, key = await self.requestor.request("post", "/foo", {"a": 1})
+
+        self.assertEqual({"foo": "bar"}, body)
+        self.assertEqual(payjp.api_key, key)
+        self.http_client.request.assert_awaited_with(
+            "post",
+            "https://api.pay.jp/foo",
+            APIHeaderMatcher(request_method="post"),
+            "a=1",
+        )
+
+    async def test_error(self):
+        self.mock_responses(('{"error": {}}', 402))
+
+        with self.assertRaises(payjp.error.CardError):
+            await self.requestor.request("get", "/foo")
+
+    async def test_retry_uses_asyncio_sleep(self):
+        payjp.max_retry = 2
+        payjp.retry_initial_delay = 0.1
+        self.mock_responses(('{"error": {}}', 429), ('{"id": "ok"}', 200))
+
+        with patch("payjp.api_requestor.asyncio.sleep", AsyncMock()) as sleep:
+            with patch("payjp.api_requestor.time.sleep") as blocking_sleep:
+                body, key = await self.requestor.request("get", "/foo")
+
+        self.assertEqual({"id": "ok"}, body)
+        self.assertEqual(1, sleep.await_count)
+        self.assertFalse(blocking_sleep.called)
+
 
 class APIRequestorRetryIntervalTest(PayjpUnitTestCase):
     def setUp(self):
@@ -16,6 +16,7 @@ from payjp.test.helper import (
     MyResource,
     MyUpdateable,
     PayjpApiTestCase,
+    PayjpAsyncApiTestCase,
     PayjpUnitTestCase,
 )
 
@@ -907,6 +908,18 @@ class SubscriptionTest(PayjpResourceTest):
             "post", "/v1/subscriptions/sub_delete/pause", {}, None
         )
 
+    def test_cancel_subscriptions_with_headers(self):
+        sub = payjp.Subscription.construct_from(
+            {"id": "sub_delete", "customer": "cus_foo", "status": "active"}, "api_key"
+        )
+        sub.cancel(headers={"Idempotency-Key": "foo"})
+        self.requestor_mock.request.assert_called_with(
+            "post",
+            "/v1/subscriptions/sub_delete/cancel",
+            {},
+            {"Idempotency-Key": "foo"},
+        )
+
     def test_cancel_subscriptions(self):
         sub = payjp.Subscription.construct_from(
             {"id": "sub_delete", "customer": "cus_foo", "status": "active"}, "api_key"
@@ -1210,5 +1223,114 @@ class ThreeDSecureRequestTest(PayjpResourceTest):
         self.assertEqual(three_d_secure_request.id, "tdsr_xxx")
 
 
+class AsyncResourceTest(PayjpAsyncApiTestCase):
+    async def test_acreate(self):
+        self.mock_response({"object": "charge", "id": "ch_async", "amount": 100})
+
+        charge = await payjp.Charge.acreate(amount=100, currency="jpy")
+
+        self.requestor_mock.request.assert_awaited_with(
+            "post", "/v1/charges", {"amount": 100, "currency": "jpy"}, None
+        )
+        self.assertTrue(isinstance(charge, payjp.Charge))
+        self.assertEqual("ch_async", charge.id)
+        self.assertEqual("reskey", charge.api_key)
+
+    async def test_aretrieve(self):
+        self.mock_response({"object": "customer", "id": "cus_async"})
+
+        customer = await payjp.Customer.aretrieve("cus_async", api_key="KEY")
+
+        self.requestor_class_mock.assert_called_with(
+            key="KEY", api_base=None, account=None
+        )
+        self.requestor_mock.request.assert_awaited_with(
+            "get", "/v1/customers/cus_async", {}, None
+        )
+        self.assertTrue(isinstance(customer, payjp.Customer))
+
+    async def test_aall(self):
+        self.mock_response(
+            {"object": "list", "data": [{"object": "event", "id": "evnt_1"}]}
+        )
+
+        events = await payjp.Event.aall(limit=1)
+
+        self.requestor_mock.request.assert_awaited_with(
+            "get", "/v1/events", {"limit": 1}
+        )
+        self.assertTrue(isinstance(events, payjp.resource.ListObject))
+        self.assertTrue(isinstance(events.data[0], payjp.Event))
+
+    async def test_asave(self):
+        self.mock_response({"object": "customer", "id": "cus_foo"})
+
+        customer = payjp.Customer.construct_from({"id": "cus_foo"}, "api_key")
+        customer.description = "async"
+        self.assertTrue(customer is await customer.asave())
+
+        self.requestor_mock.request.assert_awaited_with(
+            "post", "/v1/customers/cus_foo", {"description": "async"}, None
+        )
+
+    async def test_adelete(self):
+        self.mock_response({"id": "pl_foo", "deleted": True})
+
+        plan = payjp.Plan.construct_from({"id": "pl_foo"}, "api_key")
+        await plan.adelete()
+
+        self.requestor_mock.request.assert_awaited_with(
+            "delete", "/v1/plans/pl_foo", {}, None
+        )
+        self.assertEqual(True, plan.deleted)
+
+    async def test_charge_actions(self):
+        self.mock_response({"object": "charge", "id": "ch_foo"})
+        charge = payjp.Charge.construct_from({"id": "ch_foo"}, "api_key")
+
+        for action in ("capture", "refund", "reauth", "tds_finish"):
+            await getattr(charge, "a" + action)()
+            self.requestor_mock.request.assert_awaited_with(
+                "post", "/v1/charges/ch_foo/" + action, {}, None
+            )
+
+    async def test_subscription_actions(self):
+        self.mock_response({"object": "subscription", "id": "sub_foo"})
+        sub = payjp.Subscription.construct_from({"id": "sub_foo"}, "api_key")
+
+        for action in ("pause", "resume", "cancel"):
+            await getattr(sub, "a" + action)()
+            self.requestor_mock.request.assert_awaited_with(
+                "post", "/v1/subscriptions/sub_foo/" + action, {}, None
+            )
+
+    async def test_list_object(self):
+        self.mock_response({"object": "card", "id": "car_foo"})
+        cards = payjp.resource.ListObject.construct_from(
+            {"object": "list", "url": "/v1/customers/cus_foo/cards"}, "api_key"
+        )
+
+        card = await cards.aretrieve("car_foo")
+
+        self.requestor_mock.request.assert_awaited_with(
+            "get", "/v1/customers/cus_foo/cards/car_foo", {}, None
+        )
+        self.assertTrue(isinstance(card, payjp.resource.Card))
+
+    async def test_balance_statement_urls(self):
+        self.mock_response({"object": "statement_url", "url": "https://example"})
+
+        await payjp.Balance.astatement_urls("ba_xxx")
+        self.requestor_mock.request.assert_awaited_with(
+            "post", "/v1/balances/ba_xxx/statement_urls", {}
+        )
+
+        balance = payjp.Balance.construct_from({"id": "ba_yyy"}, "api_key")
+        await balance.astatement_urls()
+        self.requestor_mock.request.assert_awaited_with(
+            "post", "/v1/balances/ba_yyy/statement_urls", {}
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
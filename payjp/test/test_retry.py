@@ -0,0 +1,166 @@
+# coding: utf-8
+
+import unittest
+
+from mock import Mock, patch
+
+import payjp
+from payjp.error import APIConnectionError
+from payjp.retry import RetryBudget, RetryPolicy
+from payjp.test.helper import PayjpUnitTestCase
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RetryBudgetTest(unittest.TestCase):
+    def test_ratio_of_attempts(self):
+        clock = FakeClock()
+        budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=2, clock=clock)
+
+        self.assertTrue(budget.try_spend())
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+
+        budget.record_attempt()
+        self.assertFalse(budget.try_spend())
+        budget.record_attempt()
+        self.assertTrue(budget.try_spend())
+
+    def test_minimum_rate(self):
+        clock = FakeClock()
+        budget = RetryBudget(ratio=0, min_per_second=2, max_tokens=1, clock=clock)
+        budget.try_spend()
+        self.assertFalse(budget.try_spend())
+
+        clock.now += 0.5
+        self.assertTrue(budget.try_spend())
+        clock.now += 100
+        self.assertEqual(1, budget.tokens)
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = RetryPolicy()
+
+    def test_rate_limited_is_always_retryable(self):
+        self.assertTrue(self.policy.is_retryable("post", {}, status=429))
+
+    def test_server_errors_need_idempotency(self):
+        self.assertTrue(self.policy.is_retryable("get", None, status=503))
+        self.assertTrue(self.policy.is_retryable("delete", None, status=500))
+        self.assertFalse(self.policy.is_retryable("post", None, status=503))
+        self.assertTrue(
+            self.policy.is_retryable("post", {"Idempotency-Key": "k"}, status=503)
+        )
+        self.assertFalse(self.policy.is_retryable("get", None, status=400))
+        self.assertFalse(self.policy.is_retryable("get", None, status=599))
+
+    def test_connection_errors(self):
+        transient = APIConnectionError("reset", should_retry=True)
+        local = APIConnectionError("bad config")
+
+        self.assertTrue(self.policy.is_retryable("get", None, exc=transient))
+        self.assertFalse(self.policy.is_retryable("post", None, exc=transient))
+        self.assertFalse(self.policy.is_retryable("get", None, exc=local))
+        self.assertFalse(
+            RetryPolicy(connection_errors=False).is_retryable(
+                "get", None, exc=transient
+            )
+        )
+
+    def test_budget(self):
+        budget = Mock(RetryBudget)
+        budget.try_spend.return_value = False
+        policy = RetryPolicy(budget=budget)
+
+        self.assertFalse(policy.should_retry("get", None, status=503))
+        self.assertFalse(policy.should_retry("get", None, status=400))
+        self.assertEqual(1, budget.try_spend.call_count)
+
+
+@patch("time.sleep")
+class RequestorRetryPolicyTest(PayjpUnitTestCase):
+    def setUp(self):
+        super(RequestorRetryPolicyTest, self).setUp()
+        payjp.max_retry = 2
+        payjp.retry_policy = RetryPolicy(budget=RetryBudget())
+        self.http_client = Mock(payjp.http_client.HTTPClient)
+        self.http_client.name = "mockclient"
+        self.requestor = payjp.api_requestor.APIRequestor(client=self.http_client)
+
+    def test_retries_connection_errors(self, sleep):
+        self.http_client.request = Mock(
+            side_effect=[
+                APIConnectionError("timed out", should_retry=True),
+                ('{"id": "ch_1"}', 200),
+            ]
+        )
+
+        response, _ = self.requestor.request("get", "/v1/charges/ch_1")
+
+        self.assertEqual("ch_1", response["id"])
+        self.assertEqual(1, response.metadata.retries)
+        self.assertEqual(1, sleep.call_count)
+
+    def test_gives_up_after_max_retry(self, sleep):
+        self.http_client.request = Mock(
+            side_effect=APIConnectionError("timed out", should_retry=True)
+        )
+
+        with self.assertRaises(APIConnectionError):
+            self.requestor.request("get", "/v1/charges/ch_1")
+
+        self.assertEqual(3, self.http_client.request.call_count)
+
+    def test_post_needs_idempotency_key(self, sleep):
+        self.http_client.request = Mock(
+            return_value=('{"error": {"message": "oops"}}', 503)
+        )
+
+        with self.assertRaises(payjp.error.APIError):
+            self.requestor.request("post", "/v1/charges", {"amount": 100})
+        self.assertEqual(1, self.http_client.request.call_count)
+
+        with self.assertRaises(payjp.error.APIError):
+            self.requestor.request(
+                "post", "/v1/charges", {"amount": 100}, {"Idempotency-Key": "k"}
+            )
+        self.assertEqual(4, self.http_client.request.call_count)
+
+    def test_exhausted_budget(self, sleep):
+        payjp.retry_policy = RetryPolicy(
+            budget=RetryBudget(ratio=0, min_per_second=0, max_tokens=1)
+        )
+        self.http_client.request = Mock(
+            return_value=('{"error": {"message": "oops"}}', 503)
+        )
+
+        with self.assertRaises(payjp.error.APIError):
+            self.requestor.request("get", "/v1/charges/ch_1")
+        self.assertEqual(2, self.http_client.request.call_count)
+
+
+class ConnectionErrorClassificationTest(PayjpUnitTestCase):
+    def test_requests_errors(self):
+        client = payjp.http_client.RequestsClient()
+        exceptions = self.request_mocks["requests"].exceptions
+        exceptions.RequestException = Exception
+
+        for exc, expected in (
+            (payjp.http_client._RETRYABLE_REQUESTS_ERRORS[0](), True),
+            (payjp.http_client._NON_RETRYABLE_REQUESTS_ERRORS[0](), False),
+            (ValueError(), False),
+        ):
+            with self.assertRaises(APIConnectionError) as error:
+                client._handle_request_error(exc)
+            self.assertEqual(expected, error.exception.should_retry)
+
+
+if __name__ == "__main__":
+    unittest.main()
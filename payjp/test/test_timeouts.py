@@ -0,0 +1,133 @@
+# coding: utf-8
+
+import asyncio
+import time
+import unittest
+
+from mock import AsyncMock, Mock, patch
+
+import payjp
+from payjp.error import APIConnectionError, APITimeoutError
+from payjp.retry import RetryPolicy
+from payjp.test.helper import PayjpUnitTestCase
+from payjp.timeouts import current, deadline
+
+
+class DeadlineTest(unittest.TestCase):
+    def test_context(self):
+        self.assertEqual(None, current())
+
+        with deadline(10) as outer:
+            self.assertTrue(current() is outer)
+            self.assertTrue(9 < outer.remaining() <= 10)
+
+            with deadline(60):
+                # Can't extend the enclosing deadline.
+                self.assertTrue(current() is outer)
+            with deadline(1) as inner:
+                self.assertTrue(current() is inner)
+            self.assertTrue(current() is outer)
+
+        self.assertEqual(None, current())
+
+
+class RequestorDeadlineTest(PayjpUnitTestCase):
+    def setUp(self):
+        super(RequestorDeadlineTest, self).setUp()
+        payjp.max_retry = 3
+        payjp.retry_policy = RetryPolicy()
+        self.http_client = Mock(payjp.http_client.HTTPClient)
+        self.http_client.name = "mockclient"
+        self.http_client.request = Mock(return_value=('{"id": "ch_1"}', 200))
+        self.requestor = payjp.api_requestor.APIRequestor(client=self.http_client)
+
+    def test_no_deadline(self):
+        self.requestor.request("get", "/v1/charges/ch_1")
+
+        args, kwargs = self.http_client.request.call_args
+        self.assertEqual({}, kwargs)
+
+    def test_passes_remaining_time(self):
+        with payjp.deadline(5):
+            self.requestor.request("get", "/v1/charges/ch_1")
+
+        timeout = self.http_client.request.call_args[1]["timeout"]
+        self.assertTrue(4 < timeout <= 5)
+
+    def test_configured_timeout(self):
+        payjp.timeout = 2
+
+        self.requestor.request("get", "/v1/charges/ch_1")
+        self.assertTrue(self.http_client.request.call_args[1]["timeout"] <= 2)
+
+        with payjp.deadline(30):
+            self.requestor.request("get", "/v1/charges/ch_1")
+        self.assertTrue(self.http_client.request.call_args[1]["timeout"] <= 2)
+
+    def test_expired_deadline(self):
+        with payjp.deadline(0):
+            with self.assertRaises(APITimeoutError):
+                self.requestor.request("get", "/v1/charges/ch_1")
+
+        self.assertFalse(self.http_client.request.called)
+
+    @patch("time.sleep")
+    def test_skips_backoff_past_deadline(self, sleep):
+        payjp.retry_initial_delay = 10
+        self.http_client.request = Mock(
+            side_effect=APITimeoutError("timed out", should_retry=True)
+        )
+
+        with payjp.deadline(3):
+            with self.assertRaises(APITimeoutError):
+                self.requestor.request("get", "/v1/charges/ch_1")
+
+        self.assertEqual(1, self.http_client.request.call_count)
+        self.assertFalse(sleep.called)
+
+    def test_retries_within_deadline(self):
+        payjp.retry_initial_delay = 0.01
+        self.http_client.request = Mock(
+            side_effect=[
+                APIConnectionError("reset", should_retry=True),
+                ('{"id": "ch_1"}', 200),
+            ]
+        )
+
+        with payjp.deadline(5):
+            response, _ = self.requestor.request("get", "/v1/charges/ch_1")
+
+        self.assertEqual(1, response.metadata.retries)
+
+    def test_requests_client_timeout(self):
+        result = Mock()
+        result.content = "{}"
+        result.status_code = 200
+        result.headers = {}
+        session = self.request_mocks["requests"].Session.return_value
+        session.request = Mock(return_value=result)
+
+        payjp.http_client.RequestsClient().request("get", "url", {}, timeout=1.5)
+
+        self.assertEqual(1.5, session.request.call_args[1]["timeout"])
+
+
+class AsyncDeadlineTest(unittest.IsolatedAsyncioTestCase):
+    async def test_follows_into_tasks(self):
+        http_client = Mock(payjp.http_client.AsyncHTTPClient)
+        http_client.name = "mockclient"
+        http_client.request = AsyncMock(return_value=('{"id": "ch_1"}', 200))
+        requestor = payjp.api_requestor.AsyncAPIRequestor(
+            key="sk_test", client=http_client
+        )
+
+        with payjp.deadline(5):
+            start = time.monotonic()
+            await asyncio.ensure_future(requestor.request("get", "/v1/charges/ch_1"))
+
+        timeout = http_client.request.call_args[1]["timeout"]
+        self.assertTrue(0 < timeout <= 5 - (time.monotonic() - start) + 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
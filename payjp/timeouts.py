@@ -0,0 +1,56 @@
+# coding: utf-8
+
+import contextlib
+import contextvars
+import time
+
+_current = contextvars.ContextVar("payjp_deadline", default=None)
+
+
+class Deadline(object):
+    """Point in time by which an API call, retries included, must finish."""
+
+    def __init__(self, timeout, clock=time.monotonic):
+        self._clock = clock
+        self.timeout = timeout
+        self.expires_at = clock() + timeout
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def __repr__(self):
+        return "<Deadline remaining=%.3fs>" % (self.remaining(),)
+
+
+@contextlib.contextmanager
+def deadline(timeout):
+    """Bound the API calls made inside the block to `timeout` seconds.
+
+        with payjp.deadline(5):
+            charge = payjp.Charge.create(...)
+            charge.capture()
+
+    The deadline covers all attempts of a call and the backoff between
+    them, and the whole block: each call gets whatever time is left.  It
+    follows the code into coroutines and tasks started inside the block.
+    Nested deadlines can only shorten the enclosing one.  A call that runs
+    out of time raises `error.APITimeoutError`.
+    """
+    new = Deadline(timeout)
+    enclosing = _current.get()
+    if enclosing is not None and enclosing.expires_at < new.expires_at:
+        new = enclosing
+    token = _current.set(new)
+    try:
+        yield new
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """The `Deadline` set by the innermost `deadline` block, if any."""
+    return _current.get()